@@ -0,0 +1,42 @@
+# Generated by Django 6.0.1 on 2026-10-18 11:35
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_active_loans(apps, schema_editor):
+    BorrowRecord = apps.get_model("borrowing", "BorrowRecord")
+    counts = (
+        BorrowRecord.objects.filter(user=OuterRef("user"), returned_at__isnull=True)
+        .order_by()
+        .values("user")
+        .annotate(total=Count("pk"))
+        .values("total")
+    )
+    apps.get_model("accounts", "Profile").objects.update(
+        active_loans=Coalesce(Subquery(counts, output_field=models.PositiveSmallIntegerField()), Value(0))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_alter_profile_full_name_alter_profile_phone_number'),
+        ('borrowing', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='active_loans',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_active_loans, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='profile',
+            constraint=models.CheckConstraint(condition=models.Q(('active_loans__lte', 5)), name='profile_active_loans_within_limit'),
+        ),
+    ]
@@ -1,7 +1,10 @@
 from django.conf import settings
 from django.db import models
+from django.db.models import Q
 from django.utils.translation import gettext_lazy as _
 
+from borrowing.models import MAX_ACTIVE_BORROWS
+
 
 def user_profile_photo_path(instance, filename):
     return f"users/{instance.user_id}/photos/{filename}"
@@ -16,12 +19,20 @@ class Profile(models.Model):
     full_name = models.CharField(max_length=150, blank=True)
     photo = models.ImageField(upload_to=user_profile_photo_path, blank=True, null=True)
     phone_number = models.CharField(max_length=30, blank=True)
+    # Maintained by borrowing.models in the checkout/return transaction.
+    active_loans = models.PositiveSmallIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         verbose_name = _("Profile")
         verbose_name_plural = _("Profiles")
+        constraints = [
+            models.CheckConstraint(
+                condition=Q(active_loans__lte=MAX_ACTIVE_BORROWS),
+                name="profile_active_loans_within_limit",
+            ),
+        ]
 
     def __str__(self) -> str:  # pragma: no cover - trivial
         return f"Profile for {self.user}"
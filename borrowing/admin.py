@@ -1,18 +1,137 @@
+from datetime import date, timedelta
+
 from django.contrib import admin
+from django.db.models import F, Sum
+from django.template.response import TemplateResponse
+from django.urls import path
+from django.utils import timezone
+
+from library.admin_tools import BookFilter, PatronFilter, ScalableAdminMixin
+
+from .models import ArchivedBorrowRecord, BorrowRecord, CirculationDaily, Hold
+
 
-from .models import BorrowRecord
+class LoanStatusFilter(admin.SimpleListFilter):
+    title = "status"
+    parameter_name = "status"
+
+    def lookups(self, request, model_admin):
+        return (("active", "Active"), ("overdue", "Overdue"), ("due_soon", "Due within 3 days"), ("returned", "Returned"))
+
+    def queryset(self, request, queryset):
+        value = self.value()
+        if value == "active":
+            return queryset.active()
+        if value == "overdue":
+            return queryset.overdue()
+        if value == "due_soon":
+            return queryset.due_within(3)
+        if value == "returned":
+            return queryset.returned()
+        return queryset
 
 
 @admin.register(BorrowRecord)
-class BorrowRecordAdmin(admin.ModelAdmin):
+class BorrowRecordAdmin(ScalableAdminMixin, admin.ModelAdmin):
     list_display = ("user", "book", "borrowed_at", "due_at", "returned_at", "is_overdue")
-    list_filter = ("borrowed_at", "due_at", "returned_at", "user", "book")
-    search_fields = ("user__username", "user__email", "book__title")
+    list_filter = (LoanStatusFilter, "borrowed_at", "due_at", "returned_at", PatronFilter, BookFilter)
+    search_fields = ("user__username", "book__title")
+    catalog_search_field = "book"
+    exact_search_fields = ("user__username", "user__email")
     list_select_related = ("user", "book")
+    autocomplete_fields = ("user", "book")
     readonly_fields = ("borrowed_at", "due_at", "returned_at")
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_status()
+
     def is_overdue(self, obj):
         return obj.is_overdue
 
     is_overdue.boolean = True
     is_overdue.short_description = "Overdue"
+    is_overdue.admin_order_field = "loan_status"
+
+
+@admin.register(Hold)
+class HoldAdmin(ScalableAdminMixin, admin.ModelAdmin):
+    list_display = ("user", "book", "status", "created_at", "expires_at")
+    list_filter = ("status", PatronFilter, BookFilter)
+    search_fields = ("user__username", "book__title")
+    catalog_search_field = "book"
+    exact_search_fields = ("user__username",)
+    list_select_related = ("user", "book")
+    autocomplete_fields = ("user", "book")
+    readonly_fields = ("created_at", "ready_at", "expires_at")
+
+
+@admin.register(ArchivedBorrowRecord)
+class ArchivedBorrowRecordAdmin(ScalableAdminMixin, admin.ModelAdmin):
+    list_display = ("user", "book", "borrowed_at", "returned_at")
+    list_filter = (PatronFilter, BookFilter)
+    search_fields = ("user__username", "book__title")
+    catalog_search_field = "book"
+    exact_search_fields = ("user__username",)
+    list_select_related = ("user", "book")
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(CirculationDaily)
+class CirculationDailyAdmin(admin.ModelAdmin):
+    list_display = ("day", "category", "language", "checkouts", "returns", "overdues")
+    list_filter = ("category", "language")
+    list_select_related = ("category",)
+    date_hierarchy = "day"
+    change_list_template = "admin/borrowing/circulationdaily/change_list.html"
+
+    REPORT_GROUPS = {"day": "day", "category": "category__name", "language": "language"}
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        report = path(
+            "report/",
+            self.admin_site.admin_view(self.report_view),
+            name="borrowing_circulationdaily_report",
+        )
+        return [report, *super().get_urls()]
+
+    def report_view(self, request):
+        """Totals per day, category or language over a date range, read from the rollups only."""
+        today = timezone.localdate()
+        start = _parse_day(request.GET.get("start"), today - timedelta(days=30))
+        end = _parse_day(request.GET.get("end"), today)
+        group = request.GET.get("group") if request.GET.get("group") in self.REPORT_GROUPS else "day"
+        key = self.REPORT_GROUPS[group]
+
+        rollups = CirculationDaily.objects.filter(day__range=(start, end))
+        sums = {"checkouts": Sum("checkouts"), "returns": Sum("returns"), "overdues": Sum("overdues")}
+        rows = rollups.values(label=F(key)).annotate(**sums).order_by("-label" if group == "day" else "label")
+        context = {
+            **self.admin_site.each_context(request),
+            "opts": self.model._meta,
+            "title": "Circulation report",
+            "rows": rows,
+            "totals": rollups.aggregate(**sums),
+            "start": start,
+            "end": end,
+            "group": group,
+            "groups": list(self.REPORT_GROUPS),
+        }
+        return TemplateResponse(request, "admin/borrowing/circulationdaily/report.html", context)
+
+
+def _parse_day(value, default):
+    try:
+        return date.fromisoformat(value) if value else default
+    except ValueError:
+        return default
@@ -0,0 +1,33 @@
+"""
+Loan history across both storage tiers.
+
+Returned loans older than ``LOAN_ARCHIVE_AFTER_DAYS`` are moved from
+BorrowRecord to ArchivedBorrowRecord by the archive_loans command. Anything
+that asks about a patron's past loans (review eligibility, the history page)
+goes through here so it sees both tiers.
+"""
+from django.db.models import Exists, OuterRef
+
+from .models import ArchivedBorrowRecord, BorrowRecord
+
+HISTORY_FIELDS = ("id", "book_id", "borrowed_at", "due_at", "returned_at")
+
+
+def has_returned(user_id, book_id) -> bool:
+    """Whether the patron has borrowed and returned the book at least once."""
+    return (
+        BorrowRecord.objects.returned().filter(user_id=user_id, book_id=book_id).exists()
+        or ArchivedBorrowRecord.objects.filter(user_id=user_id, book_id=book_id).exists()
+    )
+
+
+def archived_loan_exists(book_id, user_ref=OuterRef("pk")):
+    """Exists() over the archive tier, for annotating a user queryset."""
+    return Exists(ArchivedBorrowRecord.objects.filter(user_id=user_ref, book_id=book_id))
+
+
+def loan_history(user):
+    """Returned loans of ``user`` from both tiers, newest first, as dicts of HISTORY_FIELDS."""
+    live = BorrowRecord.objects.returned().filter(user=user).order_by().values(*HISTORY_FIELDS)
+    archived = ArchivedBorrowRecord.objects.filter(user=user).order_by().values(*HISTORY_FIELDS)
+    return live.union(archived, all=True).order_by("-returned_at", "-id")
@@ -0,0 +1,47 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from borrowing.models import ArchivedBorrowRecord, BorrowRecord
+
+ARCHIVE_FIELDS = ("id", "user_id", "book_id", "borrowed_at", "due_at", "returned_at")
+
+
+class Command(BaseCommand):
+    help = "Move returned loans older than a cutoff from BorrowRecord to the archive table in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=getattr(settings, "LOAN_ARCHIVE_AFTER_DAYS", 365),  # Change default in config/settings.py
+            help="Archive loans returned more than this many days ago.",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000, help="Loans moved per transaction.")
+        parser.add_argument("--dry-run", action="store_true", help="Report how many loans would move.")
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options["days"])
+        eligible = BorrowRecord.objects.returned().filter(returned_at__lt=cutoff)
+        if options["dry_run"]:
+            self.stdout.write(self.style.WARNING(f"Loans: {eligible.count()} returned before {cutoff:%Y-%m-%d} to archive."))
+            return
+
+        moved = 0
+        while True:
+            with transaction.atomic():
+                rows = list(eligible.order_by("pk").values(*ARCHIVE_FIELDS)[: options["batch_size"]])
+                if not rows:
+                    break
+                # Archived rows keep the original primary keys, so a loan can
+                # never be archived twice.
+                ArchivedBorrowRecord.objects.bulk_create(
+                    (ArchivedBorrowRecord(**row) for row in rows), ignore_conflicts=True
+                )
+                BorrowRecord.objects.filter(pk__in=[row["id"] for row in rows]).delete()
+            moved += len(rows)
+            self.stdout.write(f"  moved {moved}")
+        self.stdout.write(self.style.SUCCESS(f"Loans: archived {moved}."))
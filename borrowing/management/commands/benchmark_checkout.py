@@ -0,0 +1,158 @@
+import threading
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+
+from borrowing.models import BorrowRecord
+from library.models import Author, Book, Category
+
+LOCK_RETRIES = 20
+LOCK_BACKOFF = 0.01
+
+
+class Command(BaseCommand):
+    help = (
+        "Stress checkout and return of one title from many threads, verify that "
+        "no copy is oversold or returned twice, and report throughput."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--copies", type=int, default=50, help="Copies of the benchmark title.")
+        parser.add_argument("--threads", type=int, default=8, help="Concurrent workers.")
+        parser.add_argument("--patrons", type=int, default=200, help="Patrons competing for the copies.")
+        parser.add_argument("--keep", action="store_true", help="Keep the benchmark data afterwards.")
+
+    def handle(self, *args, **options):
+        copies, threads, patrons = options["copies"], options["threads"], options["patrons"]
+        if min(copies, threads, patrons) < 1:
+            raise CommandError("--copies, --threads and --patrons must be positive.")
+
+        tag = f"bench-{uuid.uuid4().hex[:8]}"
+        book, users = self._setup(tag, copies, patrons)
+        try:
+            self._checkout_phase(book, users, threads, copies)
+            self._return_phase(book, threads, copies)
+        finally:
+            if not options["keep"]:
+                self._teardown(tag, book)
+
+    # Phases
+    def _checkout_phase(self, book, users, threads, copies):
+        def checkout(user):
+            try:
+                BorrowRecord.objects.create(user=user, book=book)
+                return "ok"
+            except ValidationError:
+                return "rejected"
+
+        results, elapsed = self._run(users, threads, checkout)
+        book.refresh_from_db(fields=["available_copies"])
+        granted = results.get("ok", 0)
+        active = BorrowRecord.objects.active().filter(book=book).count()
+
+        self._report("Checkouts", results, elapsed)
+        expected = min(copies, len(users))
+        if granted != active or active > copies or book.available_copies != copies - active or book.available_copies < 0:
+            raise CommandError(
+                f"Oversell detected: {granted} granted, {active} active loans, "
+                f"{book.available_copies} of {copies} copies left."
+            )
+        if granted != expected:
+            raise CommandError(f"Expected {expected} checkouts to succeed, got {granted}.")
+        self.stdout.write(self.style.SUCCESS(f"No oversell: {active} loans for {copies} copies."))
+
+    def _return_phase(self, book, threads, copies):
+        # Every loan is returned twice so duplicate returns race each other too.
+        records = list(BorrowRecord.objects.active().filter(book=book))
+        work = [record.pk for record in records] * 2
+
+        def give_back(record_id):
+            record = BorrowRecord.objects.get(pk=record_id)
+            if not record.is_active:
+                return "already returned"
+            record.mark_returned()
+            return "ok"
+
+        results, elapsed = self._run(work, threads, give_back)
+        book.refresh_from_db(fields=["available_copies"])
+        self._report("Returns", results, elapsed)
+        if book.available_copies != copies:
+            raise CommandError(f"Returns left {book.available_copies} of {copies} copies available.")
+        self.stdout.write(self.style.SUCCESS(f"All {copies} copies back on the shelf."))
+
+    # Helpers
+    def _run(self, items, threads, action):
+        results = {}
+        results_lock = threading.Lock()
+        queue = list(reversed(items))
+        queue_lock = threading.Lock()
+        start = threading.Barrier(threads + 1)
+
+        def worker():
+            start.wait()
+            try:
+                while True:
+                    with queue_lock:
+                        if not queue:
+                            return
+                        item = queue.pop()
+                    outcome = self._with_retries(action, item)
+                    with results_lock:
+                        results[outcome] = results.get(outcome, 0) + 1
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        for thread in workers:
+            thread.start()
+        start.wait()
+        began = time.perf_counter()
+        for thread in workers:
+            thread.join()
+        return results, time.perf_counter() - began
+
+    def _with_retries(self, action, item):
+        # SQLite allows one writer at a time; "database is locked" is contention, not a result.
+        for attempt in range(LOCK_RETRIES):
+            try:
+                return action(item)
+            except OperationalError:
+                time.sleep(LOCK_BACKOFF * (attempt + 1))
+        return "gave up"
+
+    def _report(self, label, results, elapsed):
+        elapsed = elapsed or 1e-9
+        calls = sum(results.values())
+        details = ", ".join(f"{key}: {count}" for key, count in sorted(results.items()))
+        self.stdout.write(
+            f"{label}: {details} in {elapsed:.2f}s "
+            f"({calls / elapsed:.1f} calls/s, {results.get('ok', 0) / elapsed:.1f} ok/s)"
+        )
+
+    def _setup(self, tag, copies, patrons):
+        category = Category.objects.create(name=tag)
+        author = Author.objects.create(full_name=tag)
+        book = Book.objects.create(
+            title=tag,
+            author=author,
+            category=category,
+            description="Checkout benchmark title.",
+            language="English",
+            total_copies=copies,
+            available_copies=copies,
+        )
+        User = get_user_model()
+        User.objects.bulk_create(User(username=f"{tag}-{n}", password="!") for n in range(patrons))
+        users = list(User.objects.filter(username__startswith=f"{tag}-"))
+        return book, users
+
+    def _teardown(self, tag, book):
+        BorrowRecord.objects.filter(book=book).delete()
+        book.delete()
+        Author.objects.filter(full_name=tag).delete()
+        Category.objects.filter(name=tag).delete()
+        get_user_model().objects.filter(username__startswith=f"{tag}-").delete()
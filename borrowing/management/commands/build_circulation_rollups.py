@@ -0,0 +1,26 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from borrowing.rollups import build_circulation
+
+
+class Command(BaseCommand):
+    help = "Build daily circulation rollups for the completed days since the last run."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--since", help="Rebuild from this day (YYYY-MM-DD) instead of the watermark.")
+        parser.add_argument("--through", help="Last day to build (YYYY-MM-DD, default: yesterday).")
+
+    def handle(self, *args, **options):
+        try:
+            since = date.fromisoformat(options["since"]) if options["since"] else None
+            through = date.fromisoformat(options["through"]) if options["through"] else None
+        except ValueError as exc:
+            raise CommandError(f"Invalid date: {exc}") from exc
+
+        days = build_circulation(since=since, through=through)
+        if days:
+            self.stdout.write(self.style.SUCCESS(f"Circulation: built {days} days."))
+        else:
+            self.stdout.write("Circulation: already up to date.")
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from borrowing.models import Hold, return_copy
+
+
+class Command(BaseCommand):
+    help = "Expire holds whose pickup window has passed and hand their copies to the next patron in line."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Report expired holds without changing them.")
+
+    def handle(self, *args, **options):
+        expired = Hold.objects.filter(status=Hold.READY, expires_at__lte=timezone.now())
+        if options["dry_run"]:
+            self.stdout.write(self.style.WARNING(f"Holds: {expired.count()} past their pickup window."))
+            return
+
+        handed_on = released = 0
+        for hold_id, book_id in list(expired.values_list("pk", "book_id")):
+            with transaction.atomic():
+                # Conditional, so a patron borrowing at this moment keeps the copy.
+                if not Hold.objects.filter(pk=hold_id, status=Hold.READY).update(status=Hold.EXPIRED):
+                    continue
+                if return_copy(book_id) is None:
+                    released += 1
+                else:
+                    handed_on += 1
+        self.stdout.write(
+            self.style.SUCCESS(f"Holds: expired {handed_on + released}, {handed_on} handed on, {released} back on the shelf.")
+        )
@@ -0,0 +1,36 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+
+from accounts.models import Profile
+from borrowing.models import active_loans_subquery
+
+
+class Command(BaseCommand):
+    help = "Find and fix drift in the stored active_loans counter of patron profiles."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Report drift without writing anything.")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            missing = get_user_model().objects.filter(profile__isnull=True)
+            drifted = Profile.objects.alias(actual=active_loans_subquery()).exclude(active_loans=F("actual"))
+            missing_count, drifted_count = missing.count(), drifted.count()
+            if not missing_count and not drifted_count:
+                self.stdout.write("Active loans: no drift.")
+                return
+            if options["dry_run"]:
+                self.stdout.write(
+                    self.style.WARNING(f"Active loans: {drifted_count} with drift, {missing_count} users without a profile.")
+                )
+                return
+            # Profiles created here start at 0 and are counted with the rest.
+            Profile.objects.bulk_create(Profile(user=user) for user in missing.only("pk"))
+            fixed = (
+                Profile.objects.alias(actual=active_loans_subquery())
+                .exclude(active_loans=F("actual"))
+                .update(active_loans=active_loans_subquery())
+            )
+        self.stdout.write(self.style.SUCCESS(f"Active loans: repaired {fixed}, created {missing_count} profiles."))
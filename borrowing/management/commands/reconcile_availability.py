@@ -0,0 +1,96 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from borrowing.models import BorrowRecord, Hold, hand_shelved_copies_to_holds
+from library.conditional import bump_catalog_version
+from library.models import Book
+
+REPORT_LIMIT = 20
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute Book.available_copies from active loans and copies kept for holds, "
+        "report drift and repair it with one locked UPDATE per chunk."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Report drift without writing anything.")
+        parser.add_argument("--batch-size", type=int, default=1000, help="Books read and updated per chunk.")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        on_loan, kept = committed_copies()
+
+        drifted, pending = 0, []
+        self.handed = 0
+        books = Book.objects.only("id", "title", "total_copies", "available_copies").order_by("pk")
+        for book in books.iterator(chunk_size=batch_size):
+            committed = on_loan.get(book.pk, 0) + kept.get(book.pk, 0)
+            expected = max(book.total_copies - committed, 0)
+            if book.available_copies == expected:
+                continue
+            drifted += 1
+            if drifted <= REPORT_LIMIT:
+                note = " (more loans than copies)" if committed > book.total_copies else ""
+                self.stdout.write(
+                    f"  #{book.pk} {book.title}: stored {book.available_copies}, expected {expected}{note}"
+                )
+            if not options["dry_run"]:
+                pending.append(book)
+                if len(pending) >= batch_size:
+                    self._save(pending)
+                    pending = []
+        if pending:
+            self._save(pending)
+
+        if not drifted:
+            self.stdout.write("Availability: no drift.")
+        elif options["dry_run"]:
+            self.stdout.write(self.style.WARNING(f"Availability: {drifted} books with drift."))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Availability: repaired {drifted} books."))
+        if self.handed:
+            self.stdout.write(self.style.SUCCESS(f"Holds: {self.handed} made ready with recovered copies."))
+
+    def _save(self, books):
+        with transaction.atomic():
+            book_ids = [book.pk for book in books]
+            # Checkouts and returns update the book row, so locking the chunk
+            # holds them off until the recount below is written.
+            locked = Book.objects.select_for_update().filter(pk__in=book_ids)
+            stored = dict(locked.values_list("pk", "available_copies"))
+            # One UPDATE recounts and writes each row, so nothing that
+            # committed in between can be overwritten with a stale count.
+            Book.objects.filter(pk__in=book_ids).update(
+                available_copies=Greatest(
+                    F("total_copies") - _count_per_book(BorrowRecord.objects.active())
+                    - _count_per_book(Hold.objects.filter(status=Hold.READY)),
+                    0,
+                ),
+            )
+            bump_catalog_version()
+            # Recovered copies go to the queue first, as added and returned ones do.
+            waiting = Hold.objects.filter(book_id__in=book_ids, status=Hold.WAITING).values_list("book_id", flat=True)
+            recounted = Book.objects.filter(pk__in=set(waiting)).values_list("pk", "available_copies")
+            for book_id, available in recounted:
+                if available > stored[book_id]:
+                    self.handed += hand_shelved_copies_to_holds(book_id, available - stored[book_id])
+
+
+def committed_copies():
+    """Active loans and copies kept for ready holds per book, one grouped query each."""
+    loans = BorrowRecord.objects.active()
+    holds = Hold.objects.filter(status=Hold.READY)
+    return tuple(
+        dict(queryset.order_by().values("book").annotate(total=Count("pk")).values_list("book", "total"))
+        for queryset in (loans, holds)
+    )
+
+
+def _count_per_book(queryset):
+    """Correlated COUNT(*) of the rows in ``queryset`` for the outer book."""
+    counts = queryset.filter(book=OuterRef("pk")).order_by().values("book").annotate(total=Count("pk")).values("total")
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
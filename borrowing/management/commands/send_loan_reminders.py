@@ -0,0 +1,117 @@
+from datetime import timedelta
+from itertools import groupby
+from operator import attrgetter
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from borrowing.models import BorrowRecord, LoanReminder
+
+
+class Command(BaseCommand):
+    help = (
+        "Email patrons about overdue and soon-due loans. Sent reminders are recorded on the "
+        "loans, so reruns only read loans that have not been reminded of yet."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=getattr(settings, "LOAN_REMINDER_DAYS", 2),  # Change default in config/settings.py
+            help="Remind about loans due within this many days.",
+        )
+        parser.add_argument("--chunk-size", type=int, default=500, help="Loans fetched per database round trip.")
+        parser.add_argument("--batch-size", type=int, default=100, help="Emails handed to the backend at once.")
+        parser.add_argument("--dry-run", action="store_true", help="Report what would be sent without sending.")
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        # Patrons without an address are counted, never loaded.
+        unreachable = owed_reminders(now, options["days"]).filter(user__email="")
+        self.skipped = unreachable.values("user").distinct().count()
+        # Ordered by patron so each patron's loans arrive together and fit one email.
+        loans = (
+            pending_reminders(now, options["days"])
+            .select_related("user", "book")
+            .only("due_at", "user__username", "user__email", "user__first_name", "user__last_name", "book__title")
+            .order_by("user_id", "due_at", "pk")
+        )
+        self.dry_run = options["dry_run"]
+        self.batch_size = options["batch_size"]
+        self.batch, self.reminders = [], []
+        self.emails = self.loans = 0
+
+        self.connection = None if self.dry_run else get_connection()
+        if self.connection is not None:
+            self.connection.open()
+        try:
+            for _user_id, records in groupby(loans.iterator(chunk_size=options["chunk_size"]), key=attrgetter("user_id")):
+                self._queue(list(records), now)
+            self._flush()
+        finally:
+            if self.connection is not None:
+                self.connection.close()
+
+        verb = "Would send" if self.dry_run else "Sent"
+        self.stdout.write(
+            self.style.SUCCESS(f"{verb} {self.emails} reminder emails covering {self.loans} loans.")
+        )
+        if self.skipped:
+            self.stdout.write(self.style.WARNING(f"Skipped {self.skipped} patrons without an email address."))
+
+    def _queue(self, records, now):
+        user = records[0].user
+        overdue = [record for record in records if record.due_at < now]
+        due_soon = [record for record in records if record.due_at >= now]
+        body = render_to_string(
+            "borrowing/email/loan_reminder.txt",
+            {"name": user.get_full_name() or user.username, "overdue": overdue, "due_soon": due_soon},
+        )
+        subject = "Overdue books at E-Library" if overdue else "Books due soon at E-Library"
+        self.batch.append(EmailMessage(subject, body, to=[user.email]))
+        self.reminders.extend(LoanReminder(record=record, kind=LoanReminder.OVERDUE) for record in overdue)
+        self.reminders.extend(LoanReminder(record=record, kind=LoanReminder.DUE_SOON) for record in due_soon)
+        self.loans += len(records)
+        if len(self.batch) >= self.batch_size:
+            self._flush()
+
+    def _flush(self):
+        if not self.batch:
+            return
+        if not self.dry_run:
+            self.connection.send_messages(self.batch)
+            # Recorded only once the batch is out, so a failed send is retried next run.
+            # The log and the marks on the loans commit together, since reruns go by the marks.
+            with transaction.atomic():
+                LoanReminder.objects.bulk_create(self.reminders, ignore_conflicts=True)
+                for kind in (LoanReminder.DUE_SOON, LoanReminder.OVERDUE):
+                    BorrowRecord.objects.filter(
+                        pk__in=[reminder.record_id for reminder in self.reminders if reminder.kind == kind]
+                    ).update(last_reminder=kind)
+        self.emails += len(self.batch)
+        self.batch, self.reminders = [], []
+
+
+def pending_reminders(now, days):
+    """Loans owed a reminder whose patron has an email address to send it to."""
+    return owed_reminders(now, days).exclude(user__email="")
+
+
+def owed_reminders(now, days):
+    """
+    Active loans due before ``now + days`` without a reminder of their current
+    kind. Loans already reminded of being overdue are outside the partial
+    index on due_at, so the backlog of long-overdue loans is never read again.
+    """
+    return (
+        BorrowRecord.objects.active()
+        .exclude(last_reminder=LoanReminder.OVERDUE)
+        .filter(due_at__lt=now + timedelta(days=days))
+        .filter(Q(due_at__lt=now) | Q(due_at__gte=now, last_reminder=""))
+    )
@@ -0,0 +1,20 @@
+# Generated by Django 6.0.1 on 2026-10-18 11:50
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('borrowing', '0001_initial'),
+        ('library', '0009_loan_invariants'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='borrowrecord',
+            constraint=models.UniqueConstraint(condition=models.Q(('returned_at__isnull', True)), fields=('user', 'book'), name='borrow_one_active_loan_per_book', violation_error_message='User already has an active borrow for this book.'),
+        ),
+    ]
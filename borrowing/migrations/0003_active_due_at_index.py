@@ -0,0 +1,20 @@
+# Generated by Django 6.0.1 on 2026-10-18 12:05
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('borrowing', '0002_loan_invariants'),
+        ('library', '0009_loan_invariants'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='borrowrecord',
+            index=models.Index(condition=models.Q(('returned_at__isnull', True)), fields=['due_at'], name='borrow_active_due_at_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 6.0.1 on 2026-10-18 12:50
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('borrowing', '0005_hold'),
+        ('library', '0009_loan_invariants'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedBorrowRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('borrowed_at', models.DateTimeField()),
+                ('due_at', models.DateTimeField()),
+                ('returned_at', models.DateTimeField()),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='archived_borrow_records', to='library.book')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_borrow_records', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-returned_at'],
+                'indexes': [models.Index(fields=['user', 'book'], name='borrowing_a_user_id_2e8149_idx'), models.Index(fields=['user', '-returned_at'], name='borrowing_a_user_id_d946d0_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 6.0.1 on 2026-10-18 13:20
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('borrowing', '0007_circulation_rollups'),
+        ('library', '0010_admin_listing_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='archivedborrowrecord',
+            index=models.Index(fields=['-returned_at', '-id'], name='borrowing_a_returne_d5a90a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='borrowrecord',
+            index=models.Index(fields=['-borrowed_at', '-id'], name='borrowing_b_borrowe_74b8d6_idx'),
+        ),
+    ]
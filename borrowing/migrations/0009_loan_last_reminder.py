@@ -0,0 +1,33 @@
+# Generated by Django 6.0.1 on 2026-10-18 14:00
+
+from django.db import migrations, models
+
+
+def backfill_last_reminder(apps, schema_editor):
+    BorrowRecord = apps.get_model("borrowing", "BorrowRecord")
+    LoanReminder = apps.get_model("borrowing", "LoanReminder")
+    # An overdue reminder supersedes a due-soon one.
+    for kind in ("due_soon", "overdue"):
+        BorrowRecord.objects.filter(
+            pk__in=LoanReminder.objects.filter(kind=kind).values("record_id")
+        ).update(last_reminder=kind)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('borrowing', '0008_admin_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='borrowrecord',
+            name='last_reminder',
+            field=models.CharField(blank=True, default='', max_length=10),
+        ),
+        migrations.RunPython(backfill_last_reminder, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='borrowrecord',
+            index=models.Index(condition=models.Q(('returned_at__isnull', True), models.Q(('last_reminder', 'overdue'), _negated=True)), fields=['due_at'], name='borrow_reminder_due_at_idx'),
+        ),
+    ]
@@ -2,9 +2,52 @@ from datetime import timedelta
 
 from django.conf import settings
 from django.core.exceptions import ValidationError
-from django.db import models, transaction
+from django.core.mail import send_mail
+from django.db import IntegrityError, models, transaction
+from django.db.models import Case, Count, DurationField, ExpressionWrapper, F, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce
+from django.template.loader import render_to_string
 from django.utils import timezone
 
+from library.models import Book, clean_for_save
+
+MAX_ACTIVE_BORROWS = 5
+DUPLICATE_LOAN_MESSAGE = "User already has an active borrow for this book."
+
+
+class BorrowRecordQuerySet(models.QuerySet):
+    """
+    Loan status in SQL. ``now`` defaults to the current time and can be
+    pinned so several querysets classify loans against the same instant.
+    """
+
+    def active(self):
+        return self.filter(returned_at__isnull=True)
+
+    def returned(self):
+        return self.filter(returned_at__isnull=False)
+
+    def overdue(self, now=None):
+        # Served by the partial index on due_at for active loans.
+        return self.active().filter(due_at__lt=now or timezone.now())
+
+    def due_within(self, days, now=None):
+        now = now or timezone.now()
+        return self.active().filter(due_at__gte=now, due_at__lt=now + timedelta(days=days))
+
+    def with_status(self, now=None):
+        """Annotate ``loan_status`` ("active"/"overdue"/"returned") and ``time_left``."""
+        now = now or timezone.now()
+        return self.annotate(
+            loan_status=Case(
+                When(returned_at__isnull=False, then=Value("returned")),
+                When(due_at__lt=now, then=Value("overdue")),
+                default=Value("active"),
+                output_field=models.CharField(),
+            ),
+            time_left=ExpressionWrapper(F("due_at") - Value(now), output_field=DurationField()),
+        )
+
 
 class BorrowRecord(models.Model):
     user = models.ForeignKey(
@@ -20,64 +63,66 @@ class BorrowRecord(models.Model):
     borrowed_at = models.DateTimeField(auto_now_add=True)
     due_at = models.DateTimeField()
     returned_at = models.DateTimeField(null=True, blank=True)
+    # Kind of the last reminder sent ("due_soon"/"overdue", see LoanReminder).
+    last_reminder = models.CharField(max_length=10, blank=True, default="")
+
+    objects = BorrowRecordQuerySet.as_manager()
 
     class Meta:
         ordering = ["-borrowed_at"]
         indexes = [
             models.Index(fields=["user", "returned_at"]),
             models.Index(fields=["book", "returned_at"]),
+            models.Index(fields=["-borrowed_at", "-id"]),
+            models.Index(fields=["due_at"], condition=Q(returned_at__isnull=True), name="borrow_active_due_at_idx"),
+            # Active loans still owed an overdue reminder; reminded ones drop out.
+            models.Index(
+                fields=["due_at"],
+                condition=Q(returned_at__isnull=True) & ~Q(last_reminder="overdue"),
+                name="borrow_reminder_due_at_idx",
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "book"],
+                condition=Q(returned_at__isnull=True),
+                name="borrow_one_active_loan_per_book",
+                violation_error_message=DUPLICATE_LOAN_MESSAGE,
+            ),
         ]
 
     def __str__(self) -> str:  # pragma: no cover - trivial
         status = self.status
         return f"{self.user} -> {self.book} ({status})"
 
-    # Properties
+    # Properties (use the with_status() annotations when present)
     @property
     def is_active(self) -> bool:
         return self.returned_at is None
 
     @property
     def is_overdue(self) -> bool:
-        return self.is_active and timezone.now() > self.due_at
+        return self.status == "overdue"
 
     @property
     def remaining_days(self) -> int:
         if not self.is_active:
             return 0
-        delta = self.due_at - timezone.now()
+        delta = self.__dict__.get("time_left")
+        if delta is None:
+            delta = self.due_at - timezone.now()
         return max(delta.days, 0)
 
     @property
     def status(self) -> str:
+        if "loan_status" in self.__dict__:
+            return self.loan_status
         if not self.is_active:
             return "returned"
-        if self.is_overdue:
+        if timezone.now() > self.due_at:
             return "overdue"
         return "active"
 
-    # Validation
-    def clean(self):
-        super().clean()
-        if self.pk is None:
-            if self.user_id:
-                active_count = (
-                    BorrowRecord.objects.filter(user=self.user, returned_at__isnull=True)
-                    .exclude(pk=self.pk)
-                    .count()
-                )
-                if active_count >= 5:
-                    raise ValidationError("User has reached the maximum of 5 active borrows.")
-
-                if (
-                    BorrowRecord.objects.filter(
-                        user=self.user, book=self.book, returned_at__isnull=True
-                    )
-                    .exclude(pk=self.pk)
-                    .exists()
-                ):
-                    raise ValidationError("User already has an active borrow for this book.")
-
     # Core actions
     def save(self, *args, **kwargs):
         with transaction.atomic():
@@ -92,47 +137,380 @@ class BorrowRecord(models.Model):
                 if not self.due_at:
                     self.due_at = self.borrowed_at + timedelta(days=duration_days)
 
-                # Lock the book row to ensure availability is accurate.
-                book = (
-                    self.book.__class__.objects.select_for_update()
-                    .only("id", "available_copies")
-                    .get(pk=self.book_id)
-                )
-                if book.available_copies <= 0:
-                    raise ValidationError({"book": "No copies are currently available for this title."})
-
-                # Run validations after we have book context.
-                self.full_clean()
+                # Run validations before touching the inventory. Constraints
+                # are left to the database (see _raise_for_integrity_error).
+                clean_for_save(self)
 
-                # Reserve a copy.
-                book.available_copies -= 1
-                book.save(update_fields=["available_copies"])
+                # Count the loan and reserve a copy; both conditional UPDATEs
+                # are their own checks, and a failure rolls back the other.
+                if not take_loan_slots(self.user_id):
+                    raise ValidationError(f"User has reached the maximum of {MAX_ACTIVE_BORROWS} active borrows.")
+                if not claim_copy(self.user_id, self.book_id):
+                    raise ValidationError({"book": "No copies are currently available for this title."})
 
-                super().save(*args, **kwargs)
+                try:
+                    with transaction.atomic():
+                        super().save(*args, **kwargs)
+                except IntegrityError as exc:
+                    self._raise_for_integrity_error(exc)
                 return
 
-            # Updating an existing record
-            previous = (
-                BorrowRecord.objects.select_for_update()
-                .only("returned_at", "book_id")
-                .get(pk=self.pk)
+            # Updating an existing record. Claiming the return with a
+            # conditional UPDATE means only one of two concurrent returns of
+            # the same loan puts the copy back.
+            returning_now = self.returned_at is not None and bool(
+                BorrowRecord.objects.active().filter(pk=self.pk).update(returned_at=self.returned_at)
             )
-            returning_now = previous.returned_at is None and self.returned_at is not None
+            if returning_now:
+                release_loan_slots(self.user_id)
+                return_copy(self.book_id)
 
-            self.full_clean()
-            super().save(*args, **kwargs)
+            update_fields = kwargs.get("update_fields")
+            if update_fields is not None and set(update_fields) <= {"returned_at"}:
+                # Nothing left to write beyond the claim above.
+                return
 
-            if returning_now:
-                book = (
-                    self.book.__class__.objects.select_for_update()
-                    .only("id", "available_copies")
-                    .get(pk=self.book_id)
-                )
-                book.available_copies += 1
-                book.save(update_fields=["available_copies"])
+            clean_for_save(self, update_fields)
+            try:
+                with transaction.atomic():
+                    super().save(*args, **kwargs)
+            except IntegrityError as exc:
+                self._raise_for_integrity_error(exc)
+
+    def _raise_for_integrity_error(self, exc):
+        # SQLite does not name the violated partial unique index, so look
+        # the duplicate up, on the failure path only.
+        duplicate = (
+            self.returned_at is None
+            and BorrowRecord.objects.active()
+            .filter(user_id=self.user_id, book_id=self.book_id)
+            .exclude(pk=self.pk)
+            .exists()
+        )
+        if duplicate:
+            raise ValidationError(DUPLICATE_LOAN_MESSAGE) from exc
+        raise exc
 
     def mark_returned(self):
         if not self.is_active:
             return
         self.returned_at = timezone.now()
+        # Drop with_status() annotations that no longer hold.
+        self.__dict__.pop("loan_status", None)
+        self.__dict__.pop("time_left", None)
         self.save(update_fields=["returned_at"])
+
+
+class ArchivedBorrowRecord(models.Model):
+    """
+    A returned loan moved out of BorrowRecord by the archive_loans command.
+    Keeps the original primary key, so moving a batch twice is harmless.
+    """
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="archived_borrow_records")
+    book = models.ForeignKey("library.Book", on_delete=models.PROTECT, related_name="archived_borrow_records")
+    borrowed_at = models.DateTimeField()
+    due_at = models.DateTimeField()
+    returned_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ["-returned_at"]
+        indexes = [
+            models.Index(fields=["user", "book"]),
+            models.Index(fields=["user", "-returned_at"]),
+            models.Index(fields=["-returned_at", "-id"]),
+        ]
+
+    def __str__(self) -> str:  # pragma: no cover - trivial
+        return f"{self.user} -> {self.book} (archived)"
+
+
+class CirculationDaily(models.Model):
+    """
+    Checkouts, returns and newly overdue loans of one day for one category and
+    language. Built once per completed day by build_circulation_rollups, so
+    reports never scan raw loan rows.
+    """
+
+    day = models.DateField()
+    category = models.ForeignKey("library.Category", on_delete=models.CASCADE, related_name="circulation_days")
+    language = models.CharField(max_length=50)
+    checkouts = models.PositiveIntegerField(default=0)
+    returns = models.PositiveIntegerField(default=0)
+    # Loans whose due date fell on this day while they were still out.
+    overdues = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ["-day", "category", "language"]
+        verbose_name = "daily circulation"
+        verbose_name_plural = "daily circulation"
+        constraints = [
+            models.UniqueConstraint(fields=["day", "category", "language"], name="circulation_daily_unique_slice"),
+        ]
+
+    def __str__(self) -> str:  # pragma: no cover - trivial
+        return f"{self.day} {self.category_id} {self.language}"
+
+
+class RollupWatermark(models.Model):
+    """Last day a rollup has been built through, one row per rollup."""
+
+    name = models.CharField(max_length=50, unique=True)
+    built_through = models.DateField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self) -> str:  # pragma: no cover - trivial
+        return f"{self.name} through {self.built_through}"
+
+
+class LoanReminder(models.Model):
+    """One reminder email sent for a loan; at most one per kind, so reruns skip it."""
+
+    DUE_SOON = "due_soon"
+    OVERDUE = "overdue"
+    KIND_CHOICES = [(DUE_SOON, "Due soon"), (OVERDUE, "Overdue")]
+
+    record = models.ForeignKey(BorrowRecord, on_delete=models.CASCADE, related_name="reminders")
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    sent_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-sent_at"]
+        constraints = [
+            models.UniqueConstraint(fields=["record", "kind"], name="loan_reminder_once_per_kind"),
+        ]
+
+    def __str__(self) -> str:  # pragma: no cover - trivial
+        return f"{self.get_kind_display()} reminder for {self.record_id}"
+
+
+class HoldQuerySet(models.QuerySet):
+    def with_queue_position(self):
+        """
+        Annotate ``queue_place``, the 1-based place of each waiting hold in its
+        book's queue (0 for other statuses), read by ``Hold.queue_position``.
+        """
+        ahead = (
+            self.model.objects.filter(
+                book=OuterRef("book"), status=Hold.WAITING, created_at__lte=OuterRef("created_at")
+            )
+            .order_by()
+            .values("book")
+            .annotate(total=Count("pk"))
+            .values("total")
+        )
+        return self.annotate(
+            queue_place=Case(
+                When(status=Hold.WAITING, then=Coalesce(Subquery(ahead), Value(0))),
+                default=Value(0),
+                output_field=models.PositiveIntegerField(),
+            )
+        )
+
+
+class Hold(models.Model):
+    """
+    A patron's place in the FIFO queue for a fully borrowed title. A returned
+    copy goes to the oldest waiting hold instead of back on the shelf and is
+    kept for the patron until ``expires_at``.
+    """
+
+    WAITING = "waiting"
+    READY = "ready"
+    FULFILLED = "fulfilled"
+    CANCELLED = "cancelled"
+    EXPIRED = "expired"
+    STATUS_CHOICES = [
+        (WAITING, "Waiting"),
+        (READY, "Ready for pickup"),
+        (FULFILLED, "Fulfilled"),
+        (CANCELLED, "Cancelled"),
+        (EXPIRED, "Expired"),
+    ]
+    OPEN_STATUSES = (WAITING, READY)
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="holds")
+    book = models.ForeignKey("library.Book", on_delete=models.CASCADE, related_name="holds")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=WAITING)
+    created_at = models.DateTimeField(auto_now_add=True)
+    ready_at = models.DateTimeField(null=True, blank=True)
+    expires_at = models.DateTimeField(null=True, blank=True)
+
+    objects = HoldQuerySet.as_manager()
+
+    class Meta:
+        ordering = ["created_at"]
+        indexes = [
+            models.Index(fields=["book", "created_at"], condition=Q(status="waiting"), name="hold_queue_idx"),
+            models.Index(fields=["expires_at"], condition=Q(status="ready"), name="hold_ready_expiry_idx"),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "book"],
+                condition=Q(status__in=["waiting", "ready"]),
+                name="hold_one_open_per_book",
+                violation_error_message="You already have a hold on this book.",
+            ),
+        ]
+
+    def __str__(self) -> str:  # pragma: no cover - trivial
+        return f"{self.user} waits for {self.book} ({self.status})"
+
+    @property
+    def queue_position(self) -> int:
+        """1-based place among the waiting holds of the book."""
+        if hasattr(self, "queue_place"):
+            return self.queue_place
+        if self.status != self.WAITING:
+            return 0
+        # created_at is read in SQL so display-only instances work too.
+        mine = Hold.objects.filter(pk=self.pk).values("created_at")
+        return Hold.objects.filter(
+            book_id=self.book_id, status=self.WAITING, created_at__lte=Subquery(mine)
+        ).count()
+
+    def cancel(self):
+        """Leave the queue; a copy already kept for this hold moves on."""
+        with transaction.atomic():
+            status = self.status
+            # Each UPDATE matches the status it decides on, so a return that
+            # readied the hold meanwhile is seen and its copy moved on.
+            while status not in self.OPEN_STATUSES or not (
+                Hold.objects.filter(pk=self.pk, status=status).update(status=self.CANCELLED)
+            ):
+                stored = Hold.objects.filter(pk=self.pk).values_list("status", flat=True).first()
+                if stored not in self.OPEN_STATUSES:
+                    self.status = stored or self.status
+                    return False
+                status = stored
+            self.status = self.CANCELLED
+            if status == self.READY:
+                return_copy(self.book_id)
+            else:
+                from library.conditional import bump_catalog_version
+
+                # Queue positions and hold buttons on cached pages change too.
+                bump_catalog_version()
+        return True
+
+
+def claim_copy(user_id, book_id) -> bool:
+    """
+    Take a copy for a new loan: the one kept for the patron's ready hold if
+    there is one, otherwise one from the shelf. Runs inside the checkout's
+    transaction, so a failed checkout undoes the hold changes as well.
+    """
+    fulfilled = Hold.objects.filter(
+        user_id=user_id, book_id=book_id, status=Hold.READY, expires_at__gt=timezone.now()
+    ).update(status=Hold.FULFILLED)
+    if fulfilled:
+        return True
+    if not Book.reserve_copy(book_id):
+        return False
+    # A shelf copy also serves the patron's own place in the queue; left
+    # waiting, the hold would later be readied for a book they already have.
+    Hold.objects.filter(user_id=user_id, book_id=book_id, status=Hold.WAITING).update(status=Hold.FULFILLED)
+    return True
+
+
+def return_copy(book_id):
+    """
+    Hand a returned copy to the oldest waiting hold, or put it back on the
+    shelf when nobody waits. Each hold is claimed with a conditional UPDATE,
+    so two concurrent returns never hand their copies to the same patron.
+    """
+    hold_id = _claim_oldest_hold(book_id)
+    if hold_id is None:
+        Book.release_copy(book_id)
+    return hold_id
+
+
+def hand_shelved_copies_to_holds(book_id, copies):
+    """
+    Give up to ``copies`` copies just put on the shelf (already counted in
+    ``available_copies``) to the oldest waiting holds, as ``return_copy``
+    does for a returned one. Returns the number of holds made ready.
+    """
+    handed = 0
+    while handed < copies and _claim_oldest_hold(book_id) is not None:
+        handed += 1
+    if handed:
+        Book.objects.filter(pk=book_id).update(available_copies=F("available_copies") - handed)
+    return handed
+
+
+def _claim_oldest_hold(book_id):
+    """Make the oldest waiting hold ready for pickup; None when nobody waits."""
+    while True:
+        hold_id = (
+            Hold.objects.filter(book_id=book_id, status=Hold.WAITING)
+            .order_by("created_at", "pk")
+            .values_list("pk", flat=True)
+            .first()
+        )
+        if hold_id is None:
+            return None
+        now = timezone.now()
+        pickup_days = getattr(settings, "HOLD_PICKUP_DAYS", 3)  # Change window in config/settings.py
+        claimed = Hold.objects.filter(pk=hold_id, status=Hold.WAITING).update(
+            status=Hold.READY, ready_at=now, expires_at=now + timedelta(days=pickup_days)
+        )
+        if claimed:
+            from library.conditional import bump_catalog_version
+
+            bump_catalog_version()
+            transaction.on_commit(lambda: notify_hold_ready(hold_id))
+            return hold_id
+
+
+def notify_hold_ready(hold_id):
+    hold = Hold.objects.select_related("user", "book").filter(pk=hold_id, status=Hold.READY).first()
+    if hold is None or not hold.user.email:
+        return
+    body = render_to_string("borrowing/email/hold_ready.txt", {"hold": hold})
+    send_mail(f"“{hold.book.title}” is ready for you", body, None, [hold.user.email], fail_silently=True)
+
+
+def take_loan_slots(user_id, count=1) -> bool:
+    """
+    Count ``count`` new loans against the patron's stored ``active_loans``.
+    The limit is the guard of the UPDATE itself (backed by the check
+    constraint on Profile), so concurrent checkouts cannot exceed it.
+    """
+    from accounts.models import Profile
+
+    for _attempt in range(2):
+        taken = Profile.objects.filter(
+            user_id=user_id, active_loans__lte=MAX_ACTIVE_BORROWS - count
+        ).update(active_loans=F("active_loans") + count)
+        if taken:
+            return True
+        if Profile.objects.filter(user_id=user_id).exists():
+            return False
+        # Users inserted without the post_save signal have no profile yet.
+        Profile.objects.get_or_create(
+            user_id=user_id,
+            defaults={
+                "active_loans": BorrowRecord.objects.active().filter(user_id=user_id).count()
+            },
+        )
+    return False
+
+
+def release_loan_slots(user_id, count=1):
+    from accounts.models import Profile
+
+    Profile.objects.filter(user_id=user_id, active_loans__gte=count).update(active_loans=F("active_loans") - count)
+
+
+def active_loans_subquery():
+    """Active loan count of the patron of each outer Profile row."""
+    counts = (
+        BorrowRecord.objects.active()
+        .filter(user=OuterRef("user"))
+        .order_by()
+        .values("user")
+        .annotate(total=Count("pk"))
+        .values("total")
+    )
+    return Coalesce(Subquery(counts, output_field=models.PositiveSmallIntegerField()), Value(0))
@@ -0,0 +1,149 @@
+"""
+Borrowing/review state of one patron for one book, fetched in a single query.
+
+book_detail, borrow_book and add_review all need the same handful of flags
+(active loan of this book, number of active loans as stored on the profile,
+has returned it before, existing review, open hold). ``patron_state`` gets
+them in one round trip with conditional aggregation over the patron's borrow
+records plus correlated review and hold subqueries, and memoizes the result
+on the request.
+"""
+from dataclasses import dataclass
+from datetime import datetime
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .history import archived_loan_exists
+from .models import MAX_ACTIVE_BORROWS, Hold
+
+
+@dataclass(frozen=True)
+class PatronState:
+    user_id: int
+    book_id: int
+    active_count: int
+    already_borrowed: bool
+    has_returned: bool
+    review_id: int | None
+    review_stars: Decimal | None
+    review_comment: str
+    hold_id: int | None = None
+    hold_status: str | None = None
+    hold_expires_at: datetime | None = None
+
+    @property
+    def limit_reached(self) -> bool:
+        return self.active_count >= MAX_ACTIVE_BORROWS
+
+    @property
+    def can_review(self) -> bool:
+        return self.has_returned and self.review_id is None
+
+    @property
+    def hold_ready(self) -> bool:
+        return self.hold_status == Hold.READY and self.hold_expires_at > timezone.now()
+
+    def can_borrow(self, book) -> bool:
+        has_copy = book.available_copies > 0 or self.hold_ready
+        return has_copy and not self.already_borrowed and not self.limit_reached
+
+    def can_place_hold(self, book) -> bool:
+        return book.available_copies <= 0 and not self.already_borrowed and self.hold_id is None
+
+    @property
+    def review(self):
+        """Display-only Review built from the fetched columns (None if not reviewed)."""
+        if self.review_id is None:
+            return None
+        from reviews.models import Review
+
+        return Review(
+            pk=self.review_id,
+            user_id=self.user_id,
+            book_id=self.book_id,
+            stars=self.review_stars,
+            comment=self.review_comment,
+        )
+
+    @property
+    def hold(self):
+        """Display-only open Hold built from the fetched columns (None if not queued)."""
+        if self.hold_id is None:
+            return None
+        return Hold(
+            pk=self.hold_id,
+            user_id=self.user_id,
+            book_id=self.book_id,
+            status=self.hold_status,
+            expires_at=self.hold_expires_at,
+        )
+
+
+def patron_state(request, book, user=None) -> PatronState:
+    """
+    State of ``user`` (default: the request's user) for ``book``. Memoized on
+    the request; call ``forget_patron_state`` after writes that change it.
+    """
+    user = user or request.user
+    book_id = getattr(book, "pk", book)
+    memo = request.__dict__.setdefault("_patron_states", {}) if request is not None else {}
+    key = (user.pk, book_id)
+    if key not in memo:
+        memo[key] = fetch_patron_state(user.pk, book_id)
+    return memo[key]
+
+
+def forget_patron_state(request):
+    request.__dict__.pop("_patron_states", None)
+
+
+def fetch_patron_state(user_id, book_id) -> PatronState:
+    from reviews.models import Review
+
+    review = Review.objects.filter(user_id=OuterRef("pk"), book_id=book_id).order_by()
+    hold = Hold.objects.filter(user_id=OuterRef("pk"), book_id=book_id, status__in=Hold.OPEN_STATUSES).order_by()
+    row = (
+        get_user_model()
+        .objects.filter(pk=user_id)
+        .values("pk")
+        .annotate(
+            active_count=Coalesce("profile__active_loans", 0),
+            active_for_book=Count(
+                "borrow_records",
+                filter=Q(borrow_records__returned_at__isnull=True, borrow_records__book_id=book_id),
+            ),
+            returned_for_book=Count(
+                "borrow_records",
+                filter=Q(borrow_records__returned_at__isnull=False, borrow_records__book_id=book_id),
+            ),
+            returned_archived=archived_loan_exists(book_id),
+            review_id=Subquery(review.values("pk")[:1]),
+            review_stars=Subquery(review.values("stars")[:1]),
+            review_comment=Subquery(review.values("comment")[:1]),
+            hold_id=Subquery(hold.values("pk")[:1]),
+            hold_status=Subquery(hold.values("status")[:1]),
+            hold_expires_at=Subquery(hold.values("expires_at")[:1]),
+        )
+        .values(
+            "active_count", "active_for_book", "returned_for_book", "returned_archived", "review_id", "review_stars", "review_comment",
+            "hold_id", "hold_status", "hold_expires_at",
+        )
+        .get()
+    )
+    return PatronState(
+        user_id=user_id,
+        book_id=book_id,
+        active_count=row["active_count"],
+        already_borrowed=row["active_for_book"] > 0,
+        has_returned=row["returned_for_book"] > 0 or row["returned_archived"],
+        review_id=row["review_id"],
+        review_stars=row["review_stars"],
+        review_comment=row["review_comment"] or "",
+        hold_id=row["hold_id"],
+        hold_status=row["hold_status"],
+        hold_expires_at=row["hold_expires_at"],
+    )
@@ -0,0 +1,128 @@
+"""
+Bulk checkout and return for the circulation desk.
+
+Both operations run in one transaction. The patron's active loans are read
+once for the whole batch and counted with one update of the stored
+``Profile.active_loans``, book rows are updated in primary-key order (the
+same order for every caller, so two batches can never deadlock on each
+other) with the conditional UPDATEs of ``claim_copy`` / ``return_copy``
+(which also serve the hold queue), and new loans are inserted with one
+``bulk_create``.
+
+With ``partial=False`` any failing item rolls the whole batch back and a
+ValidationError lists every reason; with ``partial=True`` the items that can
+go through do, and the rest are reported in ``BulkOutcome.failed``.
+"""
+from dataclasses import dataclass, field
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from library.models import Book
+
+from .models import (
+    DUPLICATE_LOAN_MESSAGE,
+    MAX_ACTIVE_BORROWS,
+    BorrowRecord,
+    claim_copy,
+    release_loan_slots,
+    return_copy,
+    take_loan_slots,
+)
+
+
+@dataclass
+class BulkOutcome:
+    succeeded: list = field(default_factory=list)
+    failed: dict = field(default_factory=dict)
+
+
+def bulk_checkout(user, book_ids, partial=False) -> BulkOutcome:
+    """Borrow every book in ``book_ids`` for ``user``; ``succeeded`` holds the new records."""
+    book_ids = sorted({int(pk) for pk in book_ids})
+    outcome = BulkOutcome()
+
+    with transaction.atomic():
+        active_books = set(
+            BorrowRecord.objects.active().filter(user=user).values_list("book_id", flat=True)
+        )
+        existing = set(Book.objects.filter(pk__in=book_ids).values_list("pk", flat=True))
+
+        candidates = []
+        for book_id in book_ids:
+            if book_id not in existing:
+                outcome.failed[book_id] = "Book not found."
+            elif book_id in active_books:
+                outcome.failed[book_id] = "You already have an active borrow for this book."
+            else:
+                candidates.append(book_id)
+
+        # The limit is checked once for the whole batch.
+        room = max(MAX_ACTIVE_BORROWS - len(active_books), 0)
+        for book_id in candidates[room:]:
+            outcome.failed[book_id] = f"You have reached the maximum of {MAX_ACTIVE_BORROWS} active borrows."
+        candidates = candidates[:room]
+
+        reserved = []
+        for book_id in candidates:
+            if claim_copy(user.pk, book_id):
+                reserved.append(book_id)
+            else:
+                outcome.failed[book_id] = "No copies are currently available for this title."
+
+        _raise_unless_partial(outcome, partial)
+
+        # A concurrent checkout may have used the room counted above.
+        if reserved and not take_loan_slots(user.pk, len(reserved)):
+            raise ValidationError(f"You have reached the maximum of {MAX_ACTIVE_BORROWS} active borrows.")
+
+        now = timezone.now()
+        due_at = now + timedelta(days=getattr(settings, "BORROW_DURATION_DAYS", 14))  # Change duration in config/settings.py
+        try:
+            outcome.succeeded = BorrowRecord.objects.bulk_create(
+                BorrowRecord(user=user, book_id=book_id, borrowed_at=now, due_at=due_at) for book_id in reserved
+            )
+        except IntegrityError as exc:
+            # A concurrent checkout of one of these books won the partial unique index.
+            raise ValidationError(DUPLICATE_LOAN_MESSAGE) from exc
+    return outcome
+
+
+def bulk_return(user, record_ids, partial=False) -> BulkOutcome:
+    """Return the given loans of ``user``; ``succeeded`` holds the returned record ids."""
+    record_ids = sorted({int(pk) for pk in record_ids})
+    outcome = BulkOutcome()
+
+    with transaction.atomic():
+        loans = dict(
+            BorrowRecord.objects.active().filter(user=user, pk__in=record_ids).values_list("pk", "book_id")
+        )
+        now = timezone.now()
+        returned_books = []
+        for record_id in record_ids:
+            # Claim each loan with a conditional UPDATE so a concurrent
+            # return of the same loan cannot release its copy twice.
+            claimed = record_id in loans and BorrowRecord.objects.active().filter(pk=record_id).update(
+                returned_at=now
+            )
+            if claimed:
+                outcome.succeeded.append(record_id)
+                returned_books.append(loans[record_id])
+            else:
+                outcome.failed[record_id] = "This borrow is not active."
+
+        _raise_unless_partial(outcome, partial)
+
+        if returned_books:
+            release_loan_slots(user.pk, len(returned_books))
+        for book_id in sorted(returned_books):
+            return_copy(book_id)
+    return outcome
+
+
+def _raise_unless_partial(outcome, partial):
+    if outcome.failed and not partial:
+        raise ValidationError(list(dict.fromkeys(outcome.failed.values())))
@@ -1,3 +1,673 @@
-from django.test import TestCase
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.test import RequestFactory, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import Profile
+from library.models import Author, Book, Category
+from library.pagination import EstimatedCountPaginator
+from library.testing import create_book, create_user
+from reviews.models import Review
+
+from .history import loan_history
+from .management.commands.send_loan_reminders import pending_reminders
+from .models import ArchivedBorrowRecord, BorrowRecord, CirculationDaily, Hold, LoanReminder, RollupWatermark
+from .patron import fetch_patron_state, patron_state
+from .rollups import build_circulation
+from .services import bulk_checkout, bulk_return
+
+
+class PatronStateTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user("reader", password="pass12345")
+        category = Category.objects.create(name="Science")
+        author = Author.objects.create(full_name="Ada Writer")
+        cls.book = Book.objects.create(
+            title="Patterns", author=author, category=category, description="d", language="English",
+            total_copies=3, available_copies=3,
+        )
+        cls.other = Book.objects.create(
+            title="Other", author=author, category=category, description="d", language="English",
+            total_copies=3, available_copies=3,
+        )
+
+    def test_fetches_all_flags_in_one_query(self):
+        BorrowRecord.objects.create(user=self.user, book=self.other)
+        returned = BorrowRecord.objects.create(user=self.user, book=self.book)
+        returned.mark_returned()
+        Review.objects.create(user=self.user, book=self.book, stars=4.5, comment="Good")
+        BorrowRecord.objects.create(user=self.user, book=self.book)
+
+        with self.assertNumQueries(1):
+            state = fetch_patron_state(self.user.pk, self.book.pk)
+
+        self.assertEqual(state.active_count, 2)
+        self.assertTrue(state.already_borrowed)
+        self.assertTrue(state.has_returned)
+        self.assertFalse(state.can_review)
+        self.assertEqual(state.review.stars, 4.5)
+        self.assertEqual(state.review.comment, "Good")
+
+    def test_new_patron(self):
+        state = fetch_patron_state(self.user.pk, self.book.pk)
+        self.assertEqual(state.active_count, 0)
+        self.assertFalse(state.already_borrowed)
+        self.assertFalse(state.has_returned)
+        self.assertIsNone(state.review)
+        self.assertTrue(state.can_borrow(self.book))
+
+    def test_memoized_per_request(self):
+        request = RequestFactory().get("/")
+        request.user = self.user
+        with self.assertNumQueries(1):
+            first = patron_state(request, self.book)
+            second = patron_state(request, self.book.pk)
+        self.assertIs(first, second)
+
+
+class PatronQueryBudgetTests(TestCase):
+    """Pins the number of queries of the views that share patron_state."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user("budget", password="pass12345")
+        category = Category.objects.create(name="History")
+        author = Author.objects.create(full_name="Bea Author")
+        cls.book = Book.objects.create(
+            title="Empires", author=author, category=category, description="d", language="English",
+            total_copies=2, available_copies=2,
+        )
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_book_detail(self):
+        # session + user, page visit log, book, patron state, reviews page
+        with self.assertNumQueries(6):
+            response = self.client.get(reverse("library:book_detail", args=[self.book.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context["can_borrow"])
+
+    def test_add_review_get(self):
+        BorrowRecord.objects.create(user=self.user, book=self.book).mark_returned()
+        # session + user, page visit log, book, patron state
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse("reviews:add_review", args=[self.book.pk]))
+        self.assertEqual(response.status_code, 200)
+
+    def test_borrow_book_rejects_second_active_loan_without_writing(self):
+        BorrowRecord.objects.create(user=self.user, book=self.book)
+        # session + user, page visit log, book, patron state
+        with self.assertNumQueries(5):
+            self.client.post(reverse("borrowing:borrow_book", args=[self.book.pk]))
+        self.assertEqual(BorrowRecord.objects.filter(user=self.user).count(), 1)
+
+
+class AtomicCheckoutTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.first = User.objects.create_user("first", password="pass12345")
+        cls.second = User.objects.create_user("second", password="pass12345")
+        category = Category.objects.create(name="Poetry")
+        author = Author.objects.create(full_name="Cy Poet")
+        cls.book = Book.objects.create(
+            title="Verses", author=author, category=category, description="d", language="English",
+            total_copies=1, available_copies=1,
+        )
+
+    def test_last_copy_is_granted_once(self):
+        BorrowRecord.objects.create(user=self.first, book=self.book)
+        with self.assertRaises(ValidationError):
+            BorrowRecord.objects.create(user=self.second, book=self.book)
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.available_copies, 0)
+        self.assertEqual(BorrowRecord.objects.filter(book=self.book).count(), 1)
+
+    def test_duplicate_return_releases_one_copy(self):
+        record = BorrowRecord.objects.create(user=self.first, book=self.book)
+        stale = BorrowRecord.objects.get(pk=record.pk)
+        record.mark_returned()
+        stale.mark_returned()
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.available_copies, 1)
+
+    def test_release_never_exceeds_total(self):
+        self.assertFalse(Book.release_copy(self.book.pk))
+        self.assertTrue(Book.reserve_copy(self.book.pk))
+        self.assertFalse(Book.reserve_copy(self.book.pk))
+
+
+class BulkCirculationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user("desk", password="pass12345")
+        category = Category.objects.create(name="Travel")
+        author = Author.objects.create(full_name="Dee Traveller")
+        cls.books = [
+            Book.objects.create(
+                title=f"Journey {n}", author=author, category=category, description="d", language="English",
+                total_copies=1, available_copies=0 if n == 2 else 1,
+            )
+            for n in range(7)
+        ]
+
+    def ids(self, *indexes):
+        return [self.books[n].pk for n in indexes]
+
+    def available(self):
+        return list(Book.objects.filter(pk__in=self.ids(*range(7))).order_by("pk").values_list("available_copies", flat=True))
+
+    def test_all_or_nothing_rolls_back(self):
+        with self.assertRaises(ValidationError):
+            bulk_checkout(self.user, self.ids(0, 1, 2))
+        self.assertFalse(BorrowRecord.objects.exists())
+        self.assertEqual(self.available(), [1, 1, 0, 1, 1, 1, 1])
+
+    def test_partial_keeps_what_can_go_through(self):
+        outcome = bulk_checkout(self.user, self.ids(0, 1, 2), partial=True)
+        self.assertEqual(sorted(r.book_id for r in outcome.succeeded), self.ids(0, 1))
+        self.assertEqual(list(outcome.failed), self.ids(2))
+        self.assertEqual(self.available(), [0, 0, 0, 1, 1, 1, 1])
+
+    def test_limit_applies_to_the_whole_batch(self):
+        BorrowRecord.objects.create(user=self.user, book=self.books[6])
+        outcome = bulk_checkout(self.user, self.ids(0, 1, 3, 4, 5), partial=True)
+        self.assertEqual(len(outcome.succeeded), 4)
+        self.assertEqual(list(outcome.failed), self.ids(5))
+        self.assertEqual(BorrowRecord.objects.filter(user=self.user, returned_at__isnull=True).count(), 5)
+
+    def test_bulk_return(self):
+        records = bulk_checkout(self.user, self.ids(0, 1)).succeeded
+        outcome = bulk_return(self.user, [r.pk for r in records] + [records[0].pk])
+        self.assertEqual(sorted(outcome.succeeded), sorted(r.pk for r in records))
+        self.assertEqual(self.available(), [1, 1, 0, 1, 1, 1, 1])
+        with self.assertRaises(ValidationError):
+            bulk_return(self.user, [records[0].pk])
+
+    def test_bulk_return_view(self):
+        records = bulk_checkout(self.user, self.ids(0, 1)).succeeded
+        self.client.force_login(self.user)
+        response = self.client.post(
+            reverse("borrowing:bulk_return"), {"record_ids": [r.pk for r in records], "mode": "partial"}
+        )
+        self.assertRedirects(response, reverse("borrowing:my_books"))
+        self.assertFalse(BorrowRecord.objects.filter(returned_at__isnull=True).exists())
+
+
+class ActiveLoanCounterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user("counter", password="pass12345")
+        category = Category.objects.create(name="Art")
+        author = Author.objects.create(full_name="Eve Painter")
+        cls.books = [
+            Book.objects.create(
+                title=f"Canvas {n}", author=author, category=category, description="d", language="English",
+                total_copies=2, available_copies=2,
+            )
+            for n in range(6)
+        ]
+
+    def active_loans(self):
+        return Profile.objects.get(user=self.user).active_loans
+
+    def test_checkout_and_return_move_the_counter(self):
+        record = BorrowRecord.objects.create(user=self.user, book=self.books[0])
+        self.assertEqual(self.active_loans(), 1)
+        record.mark_returned()
+        self.assertEqual(self.active_loans(), 0)
+
+    def test_limit_comes_from_the_counter(self):
+        for book in self.books[:5]:
+            BorrowRecord.objects.create(user=self.user, book=book)
+        with self.assertRaises(ValidationError):
+            BorrowRecord.objects.create(user=self.user, book=self.books[5])
+        self.assertEqual(self.active_loans(), 5)
+        self.books[5].refresh_from_db()
+        self.assertEqual(self.books[5].available_copies, 2)
+
+    def test_check_constraint(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Profile.objects.filter(user=self.user).update(active_loans=6)
+
+
+class LoanInvariantTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user("invariant", password="pass12345")
+        category = Category.objects.create(name="Law")
+        author = Author.objects.create(full_name="Finn Counsel")
+        cls.book = Book.objects.create(
+            title="Statutes", author=author, category=category, description="d", language="English",
+            total_copies=3, available_copies=3,
+        )
+
+    def test_duplicate_active_loan_maps_to_message_and_rolls_back(self):
+        BorrowRecord.objects.create(user=self.user, book=self.book)
+        with self.assertRaisesMessage(ValidationError, "User already has an active borrow for this book."):
+            BorrowRecord.objects.create(user=self.user, book=self.book)
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.available_copies, 2)
+        self.assertEqual(Profile.objects.get(user=self.user).active_loans, 1)
+
+    def test_returned_loans_do_not_block_a_new_one(self):
+        BorrowRecord.objects.create(user=self.user, book=self.book).mark_returned()
+        BorrowRecord.objects.create(user=self.user, book=self.book)
+        self.assertEqual(BorrowRecord.objects.filter(user=self.user).count(), 2)
+
+    def test_copy_check_constraints(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Book.objects.filter(pk=self.book.pk).update(available_copies=F("total_copies") + 1)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Book.objects.filter(pk=self.book.pk).update(available_copies=-1)
+
+
+class SaveValidationQueryTests(TestCase):
+    """Loan saves skip the validation queries the database already covers."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user("validator")
+        Profile.objects.get_or_create(user=cls.user)
+        cls.book = create_book("Motion", copies=2)
+
+    def test_checkout_does_not_look_up_loaded_user_and_book(self):
+        # savepoint, loan counter, ready hold, copy, waiting hold, savepoint, insert, release, release
+        # (two fewer than a full_clean() that re-checks the user and book rows)
+        with self.assertNumQueries(9):
+            record = BorrowRecord.objects.create(user=self.user, book=self.book)
+        # savepoint, claim, loan counter, waiting hold lookup, copy, release: no validation at all
+        with self.assertNumQueries(6):
+            record.mark_returned()
+
+    def test_unloaded_foreign_keys_are_still_checked(self):
+        record = BorrowRecord(user=self.user, book_id=0)
+        with self.assertRaises(ValidationError):
+            record.save()
+        self.assertFalse(BorrowRecord.objects.exists())
+
+
+class LoanStatusQuerySetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user("status", password="pass12345")
+        category = Category.objects.create(name="Drama")
+        author = Author.objects.create(full_name="Gil Playwright")
+        books = [
+            Book.objects.create(
+                title=f"Act {n}", author=author, category=category, description="d", language="English",
+                total_copies=1, available_copies=1,
+            )
+            for n in range(4)
+        ]
+        now = timezone.now()
+        cls.overdue = BorrowRecord.objects.create(user=cls.user, book=books[0], due_at=now - timedelta(days=2))
+        cls.due_soon = BorrowRecord.objects.create(user=cls.user, book=books[1], due_at=now + timedelta(days=2))
+        cls.due_later = BorrowRecord.objects.create(user=cls.user, book=books[2], due_at=now + timedelta(days=10))
+        cls.returned = BorrowRecord.objects.create(user=cls.user, book=books[3], due_at=now - timedelta(days=5))
+        cls.returned.mark_returned()
+
+    def pks(self, queryset):
+        return set(queryset.values_list("pk", flat=True))
+
+    def test_filters(self):
+        records = BorrowRecord.objects.all()
+        self.assertEqual(self.pks(records.active()), {self.overdue.pk, self.due_soon.pk, self.due_later.pk})
+        self.assertEqual(self.pks(records.overdue()), {self.overdue.pk})
+        self.assertEqual(self.pks(records.due_within(3)), {self.due_soon.pk})
+        self.assertEqual(self.pks(records.returned()), {self.returned.pk})
+
+    def test_with_status_matches_python_properties(self):
+        annotated = {record.pk: record for record in BorrowRecord.objects.with_status()}
+        for record in (self.overdue, self.due_soon, self.due_later, self.returned):
+            fresh = BorrowRecord.objects.get(pk=record.pk)
+            self.assertEqual(annotated[record.pk].loan_status, fresh.status)
+            self.assertEqual(annotated[record.pk].remaining_days, fresh.remaining_days)
+        self.assertEqual(
+            self.pks(BorrowRecord.objects.with_status().filter(loan_status="overdue")), {self.overdue.pk}
+        )
+
+
+class LoanReminderCommandTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.reader = User.objects.create_user("late", email="late@example.com", password="pass12345")
+        cls.no_email = User.objects.create_user("quiet", password="pass12345")
+        category = Category.objects.create(name="Music")
+        author = Author.objects.create(full_name="Hal Composer")
+        books = [
+            Book.objects.create(
+                title=f"Score {n}", author=author, category=category, description="d", language="English",
+                total_copies=2, available_copies=2,
+            )
+            for n in range(4)
+        ]
+        now = timezone.now()
+        cls.overdue = BorrowRecord.objects.create(user=cls.reader, book=books[0], due_at=now - timedelta(days=1))
+        cls.due_soon = BorrowRecord.objects.create(user=cls.reader, book=books[1], due_at=now + timedelta(days=1))
+        cls.later = BorrowRecord.objects.create(user=cls.reader, book=books[2], due_at=now + timedelta(days=9))
+        BorrowRecord.objects.create(user=cls.no_email, book=books[3], due_at=now - timedelta(days=1))
+
+    def test_one_email_per_patron_and_reruns_are_idempotent(self):
+        call_command("send_loan_reminders", stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ["late@example.com"])
+        self.assertIn("Score 0", mail.outbox[0].body)
+        self.assertIn("Score 1", mail.outbox[0].body)
+        self.assertNotIn("Score 2", mail.outbox[0].body)
+        self.assertEqual(
+            set(LoanReminder.objects.values_list("record_id", "kind")),
+            {(self.overdue.pk, LoanReminder.OVERDUE), (self.due_soon.pk, LoanReminder.DUE_SOON)},
+        )
+
+        call_command("send_loan_reminders", stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_reminded_loans_drop_out_of_the_candidates(self):
+        call_command("send_loan_reminders", stdout=StringIO())
+        self.assertEqual(
+            dict(BorrowRecord.objects.filter(user=self.reader).values_list("pk", "last_reminder")),
+            {self.overdue.pk: LoanReminder.OVERDUE, self.due_soon.pk: LoanReminder.DUE_SOON, self.later.pk: ""},
+        )
+        self.assertFalse(pending_reminders(timezone.now(), 2).exists())
+        out = StringIO()
+        call_command("send_loan_reminders", stdout=out)
+        self.assertIn("covering 0 loans", out.getvalue())
+        self.assertIn("Skipped 1 patrons without an email address.", out.getvalue())
+
+    def test_due_soon_loan_gets_an_overdue_reminder_later(self):
+        call_command("send_loan_reminders", stdout=StringIO())
+        BorrowRecord.objects.filter(pk=self.due_soon.pk).update(due_at=timezone.now() - timedelta(hours=1))
+        call_command("send_loan_reminders", stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertIn("Score 1", mail.outbox[1].body)
+        self.assertNotIn("Score 0", mail.outbox[1].body)
+
+    def test_dry_run_sends_and_records_nothing(self):
+        call_command("send_loan_reminders", "--dry-run", stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertFalse(LoanReminder.objects.exists())
+
+
+class HoldQueueTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.holder = User.objects.create_user("holder", password="pass12345")
+        cls.first = User.objects.create_user("first-in-line", email="first@example.com", password="pass12345")
+        cls.second = User.objects.create_user("second-in-line", password="pass12345")
+        category = Category.objects.create(name="Crime")
+        author = Author.objects.create(full_name="Ida Sleuth")
+        cls.book = Book.objects.create(
+            title="Clues", author=author, category=category, description="d", language="English",
+            total_copies=1, available_copies=1,
+        )
+
+    def setUp(self):
+        self.loan = BorrowRecord.objects.create(user=self.holder, book=self.book)
+        self.first_hold = Hold.objects.create(user=self.first, book=self.book)
+        self.second_hold = Hold.objects.create(user=self.second, book=self.book)
+
+    def available(self):
+        self.book.refresh_from_db()
+        return self.book.available_copies
+
+    def test_return_hands_the_copy_to_the_oldest_hold(self):
+        self.assertEqual(self.second_hold.queue_position, 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.loan.mark_returned()
+        self.first_hold.refresh_from_db()
+        self.assertEqual(self.first_hold.status, Hold.READY)
+        self.assertIsNotNone(self.first_hold.expires_at)
+        self.assertEqual(self.available(), 0)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ["first@example.com"])
+
+        # Only the patron the copy is kept for can borrow it.
+        with self.assertRaises(ValidationError):
+            BorrowRecord.objects.create(user=self.second, book=self.book)
+        BorrowRecord.objects.create(user=self.first, book=self.book)
+        self.first_hold.refresh_from_db()
+        self.assertEqual(self.first_hold.status, Hold.FULFILLED)
+        self.assertEqual(self.available(), 0)
+
+    def test_cancelling_a_ready_hold_moves_the_copy_on(self):
+        self.loan.mark_returned()
+        self.first_hold.refresh_from_db()
+        self.assertTrue(self.first_hold.cancel())
+        self.second_hold.refresh_from_db()
+        self.assertEqual(self.second_hold.status, Hold.READY)
+        self.assertTrue(self.second_hold.cancel())
+        self.assertEqual(self.available(), 1)
+
+    def test_borrowing_a_shelf_copy_fulfils_the_patrons_waiting_hold(self):
+        Book.objects.filter(pk=self.book.pk).update(total_copies=2, available_copies=1)
+        BorrowRecord.objects.create(user=self.second, book=self.book)
+        self.second_hold.refresh_from_db()
+        self.assertEqual(self.second_hold.status, Hold.FULFILLED)
+
+        self.loan.mark_returned()
+        self.first_hold.refresh_from_db()
+        self.assertEqual(self.first_hold.status, Hold.READY)
+        self.loan = BorrowRecord.objects.create(user=self.first, book=self.book)
+        self.loan.mark_returned()
+        self.assertEqual(self.available(), 1)
+
+    def test_cancelling_a_stale_instance_of_a_readied_hold_moves_the_copy_on(self):
+        stale = Hold.objects.get(pk=self.first_hold.pk)
+        self.loan.mark_returned()
+        self.assertTrue(stale.cancel())
+        self.assertEqual(stale.status, Hold.CANCELLED)
+        self.second_hold.refresh_from_db()
+        self.assertEqual(self.second_hold.status, Hold.READY)
+
+        stale = Hold.objects.get(pk=self.second_hold.pk)
+        Hold.objects.filter(pk=stale.pk).update(status=Hold.EXPIRED)
+        self.assertFalse(stale.cancel())
+        self.assertEqual(stale.status, Hold.EXPIRED)
+
+    def test_cancelling_a_waiting_hold_changes_the_book_page_etag(self):
+        self.client.force_login(self.second)
+        url = reverse("library:book_detail", args=[self.book.pk])
+        etag = self.client.get(url)["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(self.second_hold.cancel())
+        self.assertEqual(self.client.get(url, headers={"if_none_match": etag}).status_code, 200)
+
+    def test_expire_holds_command(self):
+        self.loan.mark_returned()
+        Hold.objects.filter(pk=self.first_hold.pk).update(expires_at=timezone.now() - timedelta(minutes=1))
+        call_command("expire_holds", stdout=StringIO())
+        self.first_hold.refresh_from_db()
+        self.second_hold.refresh_from_db()
+        self.assertEqual(self.first_hold.status, Hold.EXPIRED)
+        self.assertEqual(self.second_hold.status, Hold.READY)
+        self.assertEqual(self.available(), 0)
+
+    def test_my_books_reads_queue_positions_in_one_query(self):
+        other = Book.objects.create(
+            title="Alibis", author=self.book.author, category=self.book.category, description="d",
+            language="English", total_copies=0, available_copies=0,
+        )
+        Hold.objects.create(user=self.holder, book=other)
+        Hold.objects.create(user=self.second, book=other)
+        self.client.force_login(self.second)
+        with self.assertNumQueries(5):  # session, user, page visit log, loans, holds
+            response = self.client.get(reverse("borrowing:my_books"))
+        self.assertEqual([hold.queue_position for hold in response.context["holds"]], [2, 2])
+        self.assertContains(response, "#2 in line", count=2)
+
+    def test_place_hold_view(self):
+        self.first_hold.cancel()
+        self.client.force_login(self.first)
+        url = reverse("borrowing:place_hold", args=[self.book.pk])
+        self.client.post(url)
+        self.client.post(url)
+        self.assertEqual(Hold.objects.filter(user=self.first, status=Hold.WAITING).count(), 1)
+        self.assertEqual(Hold.objects.get(user=self.first, status=Hold.WAITING).queue_position, 2)
+
+
+class ReconcileAvailabilityTests(TestCase):
+    def test_repairs_drift_from_loans_and_ready_holds(self):
+        User = get_user_model()
+        reader, waiting = (User.objects.create_user(name, password="pass12345") for name in ("r1", "r2"))
+        category = Category.objects.create(name="Nature")
+        author = Author.objects.create(full_name="Jo Botanist")
+        book = Book.objects.create(
+            title="Leaves", author=author, category=category, description="d", language="English",
+            total_copies=3, available_copies=3,
+        )
+        BorrowRecord.objects.create(user=reader, book=book)
+        Hold.objects.create(user=waiting, book=book, status=Hold.READY, expires_at=timezone.now() + timedelta(days=1))
+        Book.objects.filter(pk=book.pk).update(available_copies=3)
+
+        out = StringIO()
+        call_command("reconcile_availability", "--dry-run", stdout=out)
+        self.assertIn("stored 3, expected 1", out.getvalue())
+        book.refresh_from_db()
+        self.assertEqual(book.available_copies, 3)
+
+        call_command("reconcile_availability", stdout=StringIO())
+        book.refresh_from_db()
+        self.assertEqual(book.available_copies, 1)
+
+    def test_recovered_copies_go_to_waiting_holds_first(self):
+        book = create_book("Roots", copies=2)
+        hold = Hold.objects.create(user=create_user("queued"), book=book)
+        Book.objects.filter(pk=book.pk).update(available_copies=0)
+
+        out = StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("reconcile_availability", stdout=out)
+        self.assertIn("Holds: 1 made ready", out.getvalue())
+        hold.refresh_from_db()
+        book.refresh_from_db()
+        self.assertEqual((hold.status, book.available_copies), (Hold.READY, 1))
+
+
+class LoanArchiveTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user("archivist", password="pass12345")
+        category = Category.objects.create(name="Maps")
+        author = Author.objects.create(full_name="Kai Cartographer")
+        cls.book = Book.objects.create(
+            title="Atlas", author=author, category=category, description="d", language="English",
+            total_copies=2, available_copies=2,
+        )
+
+    def test_archived_loans_still_count_as_history(self):
+        old = BorrowRecord.objects.create(user=self.user, book=self.book)
+        old.mark_returned()
+        BorrowRecord.objects.filter(pk=old.pk).update(returned_at=timezone.now() - timedelta(days=400))
+        recent = BorrowRecord.objects.create(user=self.user, book=self.book)
+        recent.mark_returned()
+
+        call_command("archive_loans", "--batch-size", "1", stdout=StringIO())
+
+        self.assertFalse(BorrowRecord.objects.filter(pk=old.pk).exists())
+        self.assertTrue(ArchivedBorrowRecord.objects.filter(pk=old.pk).exists())
+        self.assertTrue(BorrowRecord.objects.filter(pk=recent.pk).exists())
+        self.assertEqual([row["id"] for row in loan_history(self.user)], [recent.pk, old.pk])
+
+        BorrowRecord.objects.filter(pk=recent.pk).delete()
+        self.assertTrue(fetch_patron_state(self.user.pk, self.book.pk).has_returned)
+        Review(user=self.user, book=self.book, stars=4).full_clean()
+
+    def test_history_page(self):
+        BorrowRecord.objects.create(user=self.user, book=self.book).mark_returned()
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("borrowing:history"))
+        self.assertContains(response, "Atlas")
+
+
+class CirculationRollupTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.users = [User.objects.create_user(f"roll{n}", password="pass12345") for n in range(3)]
+        cls.category = Category.objects.create(name="Sports")
+        author = Author.objects.create(full_name="Lee Coach")
+        cls.book = Book.objects.create(
+            title="Goals", author=author, category=cls.category, description="d", language="English",
+            total_copies=5, available_copies=5,
+        )
+
+    def test_incremental_build(self):
+        today = timezone.localdate()
+        yesterday = today - timedelta(days=1)
+        at = timezone.now() - timedelta(days=1)
+        late = BorrowRecord.objects.create(user=self.users[0], book=self.book)
+        on_time = BorrowRecord.objects.create(user=self.users[1], book=self.book)
+        BorrowRecord.objects.filter(pk__in=[late.pk, on_time.pk]).update(
+            borrowed_at=at - timedelta(days=14), due_at=at
+        )
+        BorrowRecord.objects.filter(pk=on_time.pk).update(returned_at=at - timedelta(hours=1))
+
+        self.assertEqual(build_circulation(), (yesterday - timezone.localdate(at - timedelta(days=14))).days + 1)
+        row = CirculationDaily.objects.get(day=timezone.localdate(at))
+        self.assertEqual((row.category, row.language), (self.category, "English"))
+        self.assertEqual((row.checkouts, row.returns, row.overdues), (0, 1, 1))
+        self.assertEqual(
+            CirculationDaily.objects.get(day=timezone.localdate(at - timedelta(days=14))).checkouts, 2
+        )
+
+        # Nothing new to build until another day has completed.
+        self.assertEqual(build_circulation(), 0)
+        self.assertEqual(build_circulation(through=today), 1)
+        self.assertEqual(RollupWatermark.objects.get().built_through, today)
+
+
+class ScalableAdminTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = create_user("boss", email="boss@example.com", is_staff=True, is_superuser=True)
+        cls.reader = create_user("reader")
+        cls.book = create_book("Atlas of Rivers", copies=2, author="Mo Mapper", category="Geography")
+        cls.other = create_book("Mountains", author=cls.book.author, category=cls.book.category)
+        cls.loan = BorrowRecord.objects.create(user=cls.reader, book=cls.book)
+        BorrowRecord.objects.create(user=cls.admin, book=cls.other)
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def changelist(self, **params):
+        response = self.client.get(reverse("admin:borrowing_borrowrecord_changelist"), params)
+        self.assertEqual(response.status_code, 200)
+        return list(response.context["cl"].result_list)
+
+    def test_input_filters(self):
+        self.assertEqual(self.changelist(user="reader"), [self.loan])
+        self.assertEqual(self.changelist(book=str(self.book.pk)), [self.loan])
+        self.assertEqual(self.changelist(book="Atlas of Rivers", status="active"), [self.loan])
+        self.assertEqual(self.changelist(user="nobody"), [])
+
+    def test_search_uses_catalog_and_exact_username(self):
+        self.assertEqual(self.changelist(q="rivers"), [self.loan])
+        self.assertEqual(self.changelist(q="reader"), [self.loan])
+
+    def test_no_full_table_count(self):
+        with mock.patch("library.pagination.estimate_count", return_value=None) as estimate:
+            self.changelist(user="reader")
+        estimate.assert_not_called()
+        response = self.client.get(reverse("admin:borrowing_borrowrecord_changelist"), {"user": "reader"})
+        self.assertIsNone(response.context["cl"].full_result_count)
+
+    def test_paginator_estimates_unfiltered_listings(self):
+        with mock.patch("library.pagination.estimate_count", return_value=250000):
+            self.assertEqual(EstimatedCountPaginator(BorrowRecord.objects.all(), 100).count, 250000)
+            self.assertEqual(EstimatedCountPaginator(BorrowRecord.objects.filter(user=self.reader), 100).count, 1)
+        with mock.patch("library.pagination.estimate_count", return_value=None):
+            self.assertEqual(EstimatedCountPaginator(BorrowRecord.objects.all(), 100).count, 2)
@@ -7,6 +7,11 @@ app_name = "borrowing"
 urlpatterns = [
     path("borrow/<int:pk>/", views.borrow_book, name="borrow_book"),
     path("borrow/<int:book_id>/", views.borrow_book, name="borrow_book_alias"),
+    path("borrow/bulk/", views.bulk_borrow, name="bulk_borrow"),
     path("my-books/", views.my_borrowed_books, name="my_books"),
+    path("my-books/history/", views.borrow_history, name="history"),
     path("return/<int:record_id>/", views.return_book, name="return_book"),
+    path("return/bulk/", views.bulk_return_books, name="bulk_return"),
+    path("hold/<int:pk>/", views.place_hold, name="place_hold"),
+    path("hold/<int:hold_id>/cancel/", views.cancel_hold, name="cancel_hold"),
 ]
@@ -1,28 +1,35 @@
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import IntegrityError, transaction
 from django.shortcuts import get_object_or_404, redirect, render
+from django.template.defaultfilters import pluralize
 from django.urls import reverse
+from django.views.decorators.http import require_POST
 
 from library.models import Book
 
-from .models import BorrowRecord
+from .history import loan_history
+from .models import MAX_ACTIVE_BORROWS, BorrowRecord, Hold
+from .patron import forget_patron_state, patron_state
+from .services import bulk_checkout, bulk_return
 
 
 @login_required
 def borrow_book(request, pk):
     book = get_object_or_404(Book, pk=pk)
+    state = patron_state(request, book)
 
-    if book.available_copies <= 0:
-        messages.warning(request, "No copies available right now.")
+    if book.available_copies <= 0 and not state.hold_ready:
+        messages.warning(request, "No copies available right now. Place a hold to be next in line.")
         return redirect(request.META.get("HTTP_REFERER", reverse("library:book_detail", args=[pk])))
 
-    active_borrows = BorrowRecord.objects.filter(user=request.user, returned_at__isnull=True)
-
-    if active_borrows.count() >= 5:
-        messages.error(request, "You have reached the maximum of 5 active borrows.")
+    if state.limit_reached:
+        messages.error(request, f"You have reached the maximum of {MAX_ACTIVE_BORROWS} active borrows.")
         return redirect(request.META.get("HTTP_REFERER", reverse("library:book_detail", args=[pk])))
 
-    if active_borrows.filter(book=book).exists():
+    if state.already_borrowed:
         messages.info(request, "You already have an active borrow for this book.")
         return redirect(request.META.get("HTTP_REFERER", reverse("library:book_detail", args=[pk])))
 
@@ -31,6 +38,7 @@ def borrow_book(request, pk):
         messages.success(request, f"You borrowed “{book.title}”.")
     except Exception as exc:  # e.g., ValidationError
         messages.error(request, str(exc))
+    forget_patron_state(request)
 
     return redirect(request.META.get("HTTP_REFERER", reverse("library:book_detail", args=[pk])))
 
@@ -39,10 +47,27 @@ def borrow_book(request, pk):
 def my_borrowed_books(request):
     records = (
         BorrowRecord.objects.select_related("book", "book__author", "book__category")
-        .filter(user=request.user, returned_at__isnull=True)
+        .filter(user=request.user)
+        .active()
+        .with_status()
         .order_by("due_at")
     )
-    return render(request, "borrowing/my_books.html", {"records": records})
+    holds = (
+        Hold.objects.select_related("book")
+        .filter(user=request.user, status__in=Hold.OPEN_STATUSES)
+        .with_queue_position()
+    )
+    return render(request, "borrowing/my_books.html", {"records": records, "holds": holds})
+
+
+@login_required
+def borrow_history(request):
+    """Returned loans from both the live and the archive tier, newest first."""
+    page_obj = Paginator(loan_history(request.user), 20).get_page(request.GET.get("page"))
+    books = Book.objects.only("id", "title").in_bulk([row["book_id"] for row in page_obj])
+    for row in page_obj:
+        row["book"] = books.get(row["book_id"])
+    return render(request, "borrowing/history.html", {"page_obj": page_obj})
 
 
 @login_required
@@ -54,5 +79,102 @@ def return_book(request, record_id):
         messages.info(request, "This borrow was already returned.")
     else:
         record.mark_returned()
+        forget_patron_state(request)
         messages.success(request, f'Returned "{record.book.title}".')
     return redirect(request.META.get("HTTP_REFERER", reverse("borrowing:my_books")))
+
+
+@login_required
+@require_POST
+def place_hold(request, pk):
+    """Join the FIFO queue for a fully borrowed book."""
+    book = get_object_or_404(Book, pk=pk)
+    state = patron_state(request, book)
+    fallback = request.META.get("HTTP_REFERER", reverse("library:book_detail", args=[pk]))
+
+    if not state.can_place_hold(book):
+        if state.hold_id is not None:
+            messages.info(request, "You already have a hold on this book.")
+        elif state.already_borrowed:
+            messages.info(request, "You already have an active borrow for this book.")
+        else:
+            messages.info(request, "Copies are available, borrow it right away.")
+        return redirect(fallback)
+
+    try:
+        with transaction.atomic():
+            hold = Hold.objects.create(user=request.user, book=book)
+    except IntegrityError:
+        messages.info(request, "You already have a hold on this book.")
+        return redirect(fallback)
+    forget_patron_state(request)
+    messages.success(
+        request,
+        f"You are #{hold.queue_position} in line for “{book.title}”. We will email you when a copy is kept for you.",
+    )
+    return redirect(fallback)
+
+
+@login_required
+@require_POST
+def cancel_hold(request, hold_id):
+    hold = get_object_or_404(Hold, pk=hold_id, user=request.user)
+    if hold.cancel():
+        messages.success(request, f"Your hold on “{hold.book.title}” was cancelled.")
+    else:
+        messages.info(request, "This hold is no longer open.")
+    forget_patron_state(request)
+    return redirect(request.META.get("HTTP_REFERER", reverse("borrowing:my_books")))
+
+
+def _posted_ids(request, name):
+    return [value for value in request.POST.getlist(name) if value.isdigit()]
+
+
+@login_required
+@require_POST
+def bulk_borrow(request):
+    """Borrow several books at once; ``mode=partial`` keeps the ones that can go through."""
+    fallback = request.META.get("HTTP_REFERER", reverse("library:book_list"))
+    book_ids = _posted_ids(request, "book_ids")
+    if not book_ids:
+        messages.info(request, "Select at least one book to borrow.")
+        return redirect(fallback)
+
+    try:
+        outcome = bulk_checkout(request.user, book_ids, partial=request.POST.get("mode") == "partial")
+    except ValidationError as exc:
+        messages.error(request, " ".join(exc.messages))
+        return redirect(fallback)
+    forget_patron_state(request)
+
+    if outcome.succeeded:
+        messages.success(request, f"You borrowed {len(outcome.succeeded)} book{pluralize(len(outcome.succeeded))}.")
+    if outcome.failed:
+        titles = dict(Book.objects.filter(pk__in=outcome.failed).values_list("pk", "title"))
+        for book_id, reason in outcome.failed.items():
+            messages.warning(request, f"“{titles.get(book_id, book_id)}”: {reason}")
+    return redirect(reverse("borrowing:my_books") if outcome.succeeded else fallback)
+
+
+@login_required
+@require_POST
+def bulk_return_books(request):
+    """Return several active loans at once."""
+    record_ids = _posted_ids(request, "record_ids")
+    if not record_ids:
+        messages.info(request, "Select at least one book to return.")
+        return redirect("borrowing:my_books")
+
+    try:
+        outcome = bulk_return(request.user, record_ids, partial=request.POST.get("mode") == "partial")
+    except ValidationError as exc:
+        messages.error(request, " ".join(exc.messages))
+        return redirect("borrowing:my_books")
+    forget_patron_state(request)
+
+    if outcome.succeeded:
+        messages.success(request, f"Returned {len(outcome.succeeded)} book{pluralize(len(outcome.succeeded))}.")
+    if outcome.failed:
+        messages.info(request, f"{len(outcome.failed)} selected borrow(s) were already returned.")
+    return redirect("borrowing:my_books")
@@ -45,6 +45,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'library.middleware.PrecompressedStaticFilesMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -125,6 +126,55 @@ STATIC_URL = 'static/'
 STATICFILES_DIRS = [BASE_DIR / 'static']
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
+# `collectstatic` writes content-hashed names plus .gz/.br (or .zz) variants;
+# PrecompressedStaticFilesMiddleware serves them from STATIC_ROOT when
+# SERVE_STATIC is on (by default whenever DEBUG is off).
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'library.storage.CompressedManifestStaticFilesStorage',
+    },
+}
+
+SERVE_STATIC = not DEBUG
+
 # Default borrowing duration in days
 
 BORROW_DURATION_DAYS = 14
+
+# Days a returned copy is kept for the next patron in the hold queue
+
+HOLD_PICKUP_DAYS = 3
+
+# Returned loans older than this many days are moved to the archive table (archive_loans)
+
+LOAN_ARCHIVE_AFTER_DAYS = 365
+
+# Cache
+# https://docs.djangoproject.com/en/6.0/topics/cache/
+# Home page sections are invalidated through this cache, so with several
+# worker processes point it at a shared backend (Redis/Memcached).
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Seconds a cached home page section stays fresh
+
+HOME_CACHE_TIMEOUT = 600
+
+# Email
+# https://docs.djangoproject.com/en/6.0/topics/email/
+# Loan reminders (send_loan_reminders) go out through this backend; the
+# console backend just prints them during development.
+
+EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+DEFAULT_FROM_EMAIL = 'E-Library <no-reply@e-library.local>'
+
+# Days before the due date at which a "due soon" reminder is sent
+
+LOAN_REMINDER_DAYS = 2
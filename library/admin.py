@@ -1,26 +1,98 @@
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ActionForm
 
-from .models import Author, Book, Category
+from .admin_tools import InputFilter, ScalableAdminMixin
+from .models import Author, Book, Category, adjust_copies
+
+REPORT_LIMIT = 20
+
+
+class CopiesActionForm(ActionForm):
+    copies = forms.IntegerField(min_value=1, initial=1, required=False, label="Copies")
+
+
+class AuthorNameFilter(InputFilter):
+    title = "author (exact name)"
+    parameter_name = "author"
+    lookup = "author__full_name"
+
+
+class LanguageFilter(InputFilter):
+    title = "language"
+    parameter_name = "language"
+    lookup = "language"
+
+
+class PublicationYearFilter(InputFilter):
+    title = "publication year"
+    parameter_name = "year"
+    lookup = "publication_year"
 
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
-    list_display = ("name", "icon", "slug")
+    list_display = ("name", "icon", "slug", "book_count")
     search_fields = ("name", "slug")
-    readonly_fields = ("slug",)
+    readonly_fields = ("slug", "book_count")
 
 
 @admin.register(Author)
-class AuthorAdmin(admin.ModelAdmin):
-    list_display = ("full_name", "created_at")
-    search_fields = ("full_name",)
+class AuthorAdmin(ScalableAdminMixin, admin.ModelAdmin):
+    list_display = ("full_name", "book_count", "created_at")
+    search_fields = ("^full_name",)
     list_filter = ("created_at",)
 
 
 @admin.register(Book)
-class BookAdmin(admin.ModelAdmin):
+class BookAdmin(ScalableAdminMixin, admin.ModelAdmin):
     list_display = ("title", "author", "category", "total_copies", "available_copies", "created_at")
-    search_fields = ("title", "author__full_name", "category__name", "language")
-    list_filter = ("category", "author", "language", "publication_year", "created_at")
+    search_fields = ("title", "author__full_name")
+    catalog_search_field = "pk"
+    list_filter = ("category", AuthorNameFilter, LanguageFilter, PublicationYearFilter, "created_at")
     list_select_related = ("author", "category")
+    autocomplete_fields = ("author", "category")
     readonly_fields = ("created_at",)
+    # Served by the (created_at, id) index instead of sorting on the joined author name.
+    ordering = ("-created_at",)
+    action_form = CopiesActionForm
+    actions = ("add_copies", "remove_copies")
+
+    def add_copies(self, request, queryset):
+        self._adjust_copies(request, queryset, 1)
+
+    add_copies.short_description = "Add copies to selected books"
+
+    def remove_copies(self, request, queryset):
+        self._adjust_copies(request, queryset, -1)
+
+    remove_copies.short_description = "Remove copies from selected books"
+
+    def _adjust_copies(self, request, queryset, sign):
+        try:
+            copies = CopiesActionForm.base_fields["copies"].clean(request.POST.get("copies")) or 1
+        except forms.ValidationError:
+            self.message_user(request, "Enter a positive number of copies.", messages.ERROR)
+            return
+        adjusted, rejected = adjust_copies(queryset, sign * copies)
+        if adjusted:
+            self.message_user(
+                request,
+                f"{'Added' if sign > 0 else 'Removed'} {copies} copies on {len(adjusted)} books: "
+                + _summarize(adjusted, lambda book: f"{book.title} (now {book.available_copies}/{book.total_copies})"),
+                messages.SUCCESS,
+            )
+        if rejected:
+            self.message_user(
+                request,
+                f"Not enough copies on the shelf to remove {copies} from {len(rejected)} books: "
+                + _summarize(rejected, lambda book: f"{book.title} ({book.available_copies} available)"),
+                messages.WARNING,
+            )
+
+
+def _summarize(books, describe):
+    text = ", ".join(describe(book) for book in books[:REPORT_LIMIT])
+    if len(books) > REPORT_LIMIT:
+        text += f" and {len(books) - REPORT_LIMIT} more"
+    return text + "."
@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class LibraryConfig(AppConfig):
     name = 'library'
+
+    def ready(self):
+        # Import signal handlers
+        from . import signals  # noqa: F401
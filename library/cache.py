@@ -0,0 +1,90 @@
+"""
+Cached page sections with signal-driven invalidation.
+
+Each section is stored together with a "fresh until" timestamp and kept in
+the cache a little longer than that. Once it goes stale, the first worker to
+grab a short lock recomputes it while everyone else keeps serving the stale
+copy, so an expiry never turns into a burst of identical queries.
+
+Explicit invalidation bumps a per-section generation number that is part of
+the cache key, so a result computed from pre-invalidation data can never be
+written over the new generation. Workers that miss wait briefly for whoever
+holds the lock before computing the section themselves.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+KEY_PREFIX = "library:section:"
+GENERATION_SUFFIX = ":gen"
+LOCK_SUFFIX = ":lock"
+
+LOCK_TIMEOUT = 30
+STALE_GRACE = 300
+WAIT_STEPS = 20
+WAIT_INTERVAL = 0.05
+
+HOME_LATEST_BOOKS = "home:latest_books"
+HOME_TOP_RATED_BOOKS = "home:top_rated_books"
+HOME_STATS = "home:stats"
+
+
+def _timeout():
+    return getattr(settings, "HOME_CACHE_TIMEOUT", 600)  # Change lifetime in config/settings.py
+
+
+def get_section(name, compute):
+    key = _current_key(name)
+    entry = cache.get(key)
+    now = time.time()
+    if entry is not None:
+        value, fresh_until = entry
+        if fresh_until > now or not _acquire(key):
+            return value
+        return _refresh(key, compute)
+
+    if _acquire(key):
+        return _refresh(key, compute)
+
+    # Someone else is rebuilding a missing section; give them a moment.
+    for _ in range(WAIT_STEPS):
+        time.sleep(WAIT_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry[0]
+    return compute()
+
+
+def invalidate(*names):
+    """Move sections to a new generation once the current transaction commits."""
+    transaction.on_commit(lambda: [_bump_generation(name) for name in names])
+
+
+def _current_key(name):
+    # Seeded from the clock so a recreated generation never reuses an old key.
+    generation = cache.get_or_set(KEY_PREFIX + name + GENERATION_SUFFIX, lambda: int(time.time() * 1000), None)
+    return f"{KEY_PREFIX}{name}:{generation}"
+
+
+def _bump_generation(name):
+    try:
+        cache.incr(KEY_PREFIX + name + GENERATION_SUFFIX)
+    except ValueError:
+        # Generation key already evicted; the next read seeds a fresh one.
+        pass
+
+
+def _acquire(key):
+    return cache.add(key + LOCK_SUFFIX, 1, LOCK_TIMEOUT)
+
+
+def _refresh(key, compute):
+    try:
+        value = compute()
+        timeout = _timeout()
+        cache.set(key, (value, time.time() + timeout), timeout + STALE_GRACE)
+        return value
+    finally:
+        cache.delete(key + LOCK_SUFFIX)
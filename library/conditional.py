@@ -0,0 +1,52 @@
+"""
+Conditional GET support (ETag) for catalog pages.
+
+A catalog-wide version number lives in the cache and is bumped after every
+committed write to books, reviews, categories, authors, copies or holds.
+ETags hash that version together with the viewer and the full URL, so
+If-None-Match is answered without touching the database.
+
+There is deliberately no Last-Modified: a page shows rows other than its
+own object (the listed books, the author and category names, the patron's
+loans and holds), and no single row's modification time covers all of them.
+
+Authenticated pages are personalized (navbar, borrow/review state), so the
+viewer is part of the ETag and the views send Vary: Cookie.
+"""
+import hashlib
+import time
+
+from django.contrib import messages
+from django.core.cache import cache
+from django.db import transaction
+
+VERSION_KEY = "library:catalog_version"
+
+
+def catalog_version():
+    # Seeded from the clock so a lost key never brings back an old version.
+    return cache.get_or_set(VERSION_KEY, lambda: int(time.time() * 1000), None)
+
+
+def bump_catalog_version():
+    def bump():
+        try:
+            cache.incr(VERSION_KEY)
+        except ValueError:
+            # Key evicted; the next read seeds a fresh version.
+            pass
+
+    transaction.on_commit(bump)
+
+
+def has_pending_messages(request):
+    # A pending flash message must be rendered, never answered with a 304.
+    return bool(len(messages.get_messages(request)))
+
+
+def catalog_etag(request, *args, **kwargs):
+    if has_pending_messages(request):
+        return None
+    viewer = request.user.pk if request.user.is_authenticated else "anon"
+    raw = f"{catalog_version()}|{viewer}|{request.get_full_path()}"
+    return hashlib.sha1(raw.encode()).hexdigest()
@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from library.models import Book, adjust_copies
+
+REPORT_LIMIT = 20
+
+
+class Command(BaseCommand):
+    help = (
+        "Add (or with a negative number remove) copies on a set of books with one UPDATE, "
+        "keeping available copies in step and refusing to take copies that are on loan."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("delta", type=int, help="Copies to add per book; negative to remove.")
+        parser.add_argument("--book", type=int, action="append", dest="book_ids", help="Book id (repeatable).")
+        parser.add_argument("--category", help="Category slug.")
+        parser.add_argument("--author", type=int, help="Author id.")
+        parser.add_argument("--language", help="Book language.")
+        parser.add_argument("--all", action="store_true", help="Adjust every book in the catalog.")
+        parser.add_argument("--dry-run", action="store_true", help="Report what would change without writing.")
+
+    def handle(self, *args, **options):
+        delta = options["delta"]
+        if not delta:
+            raise CommandError("delta must not be zero.")
+        if not options["all"] and not any(options[name] for name in ("book_ids", "category", "author", "language")):
+            raise CommandError("Select books with --book, --category, --author or --language, or pass --all.")
+        books = Book.objects.all()
+        if options["book_ids"]:
+            books = books.filter(pk__in=options["book_ids"])
+        if options["category"]:
+            books = books.filter(category__slug=options["category"])
+        if options["author"]:
+            books = books.filter(author_id=options["author"])
+        if options["language"]:
+            books = books.filter(language=options["language"])
+
+        if options["dry_run"]:
+            books = list(books.order_by("pk").only("id", "title", "total_copies", "available_copies"))
+            rejected = [book for book in books if book.available_copies + delta < 0]
+            adjusted = [book for book in books if book.available_copies + delta >= 0]
+            for book in adjusted:
+                book.total_copies += delta
+                book.available_copies += delta
+        else:
+            adjusted, rejected = adjust_copies(books, delta)
+
+        for book in adjusted[:REPORT_LIMIT]:
+            self.stdout.write(f"  #{book.pk} {book.title}: {book.available_copies}/{book.total_copies} available")
+        for book in rejected[:REPORT_LIMIT]:
+            self.stdout.write(f"  #{book.pk} {book.title}: only {book.available_copies} on the shelf, unchanged")
+
+        verb = "would adjust" if options["dry_run"] else "adjusted"
+        self.stdout.write(self.style.SUCCESS(f"Books: {verb} {len(adjusted)} by {delta:+d} copies."))
+        if rejected:
+            self.stdout.write(self.style.WARNING(f"Books: {len(rejected)} without enough copies on the shelf."))
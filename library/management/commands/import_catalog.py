@@ -0,0 +1,182 @@
+import csv
+import json
+import os
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from library import cache as section_cache
+from library import search
+from library.conditional import bump_catalog_version
+from library.models import Author, Book, Category, ImportCheckpoint, recount_book_counts
+from library.slugs import allocate_slugs
+
+BOOK_FIELDS = ("title", "description", "language", "publication_year", "pages", "total_copies", "available_copies")
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream books from a CSV or JSON Lines file into the catalog in batches. Authors and categories "
+        "are matched by name (and created as needed), rejected rows are written to a report, and an "
+        "interrupted import can be resumed from its last committed batch."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "path",
+            help="CSV with a header row or JSON Lines; columns: title, author, category, description, "
+            "language, publication_year, pages, total_copies, available_copies.",
+        )
+        parser.add_argument("--format", choices=("csv", "jsonl"), help="Input format (default: from the extension).")
+        parser.add_argument("--batch-size", type=int, default=1000, help="Rows validated and inserted per transaction.")
+        parser.add_argument(
+            "--checkpoint", help="Name the progress is stored under for --resume (default: the file's absolute path)."
+        )
+        parser.add_argument("--rejects", help="JSON Lines report of rejected rows (default: <path>.rejects.jsonl).")
+        parser.add_argument("--resume", action="store_true", help="Continue an interrupted import from its checkpoint.")
+        parser.add_argument("--restart", action="store_true", help="Discard an interrupted import's checkpoint.")
+
+    def handle(self, *args, **options):
+        path, batch_size = options["path"], options["batch_size"]
+        if batch_size < 1:
+            raise CommandError("--batch-size must be positive.")
+        fmt = options["format"] or ("jsonl" if path.endswith((".jsonl", ".ndjson")) else "csv")
+        source_name = options["checkpoint"] or os.path.abspath(path)
+        rejects_path = options["rejects"] or f"{path}.rejects.jsonl"
+
+        if options["restart"]:
+            ImportCheckpoint.objects.filter(source=source_name).delete()
+        progress = ImportCheckpoint.objects.filter(source=source_name).first()
+        if progress is None:
+            progress = ImportCheckpoint(source=source_name)
+        elif not options["resume"]:
+            raise CommandError(
+                f"An interrupted import of {source_name} stopped after {progress.records} rows; "
+                "pass --resume to continue it or --restart to start over."
+            )
+        else:
+            self.stdout.write(f"Resuming after {progress.records} rows.")
+
+        # Name -> instance maps, filled from the database and by new rows as the import goes.
+        self.authors, self.categories = {}, {}
+        try:
+            source = open(path, newline="", encoding="utf-8")
+        except OSError as exc:
+            raise CommandError(f"Cannot read {path}: {exc}") from exc
+        with source, open(rejects_path, "a" if progress.records else "w", encoding="utf-8") as self.rejects:
+            # The checkpoint commits with each batch, so rows it covers are skipped, never re-imported.
+            rows = islice(enumerate(_read(source, fmt), start=1), progress.records, None)
+            while batch := list(islice(rows, batch_size)):
+                self._import_batch(batch, progress)
+                self.stdout.write(f"  {progress.records} rows read, {progress.imported} imported")
+
+        if progress.pk:
+            progress.delete()
+        # bulk_create() sends no post_save, so the home page sections are refreshed here.
+        section_cache.invalidate(
+            section_cache.HOME_LATEST_BOOKS, section_cache.HOME_TOP_RATED_BOOKS, section_cache.HOME_STATS
+        )
+        self.stdout.write(self.style.SUCCESS(f"Books: imported {progress.imported}."))
+        if progress.rejected:
+            self.stdout.write(self.style.WARNING(f"Books: rejected {progress.rejected}, see {rejects_path}."))
+
+    def _import_batch(self, batch, progress):
+        valid, rejected = [], []
+        for number, row in batch:
+            try:
+                valid.append(_build_book(row))
+            except ValidationError as exc:
+                errors = exc.message_dict if hasattr(exc, "error_dict") else exc.messages
+                rejected.append({"record": number, "errors": errors, "row": row})
+
+        with transaction.atomic():
+            if valid:
+                self._resolve_authors({author for _book, author, _category in valid})
+                self._resolve_categories({category for _book, _author, category in valid})
+                books = []
+                for book, author, category in valid:
+                    book.author, book.category = self.authors[author], self.categories[category]
+                    books.append(book)
+                Book.objects.bulk_create(books)
+                # What the post_save receivers in library.signals would have done row by row.
+                recount_book_counts(Author.objects.filter(pk__in={book.author_id for book in books}), "author")
+                recount_book_counts(Category.objects.filter(pk__in={book.category_id for book in books}), "category")
+                search.index_books([book.pk for book in books])
+                bump_catalog_version()
+            progress.records = batch[-1][0]
+            progress.imported += len(valid)
+            progress.rejected += len(rejected)
+            progress.save()
+
+        for rejection in rejected:
+            self.rejects.write(json.dumps(rejection, default=str) + "\n")
+        self.rejects.flush()
+
+    def _resolve_authors(self, names):
+        missing = names - self.authors.keys()
+        if not missing:
+            return
+        # Names are not unique; the oldest matching author wins.
+        for author in Author.objects.filter(full_name__in=missing).order_by("pk"):
+            self.authors.setdefault(author.full_name, author)
+        new = [Author(full_name=name) for name in sorted(missing - self.authors.keys())]
+        for author in Author.objects.bulk_create(new):
+            self.authors[author.full_name] = author
+
+    def _resolve_categories(self, names):
+        missing = names - self.categories.keys()
+        if not missing:
+            return
+        for category in Category.objects.filter(name__in=missing):
+            self.categories[category.name] = category
+        new = allocate_slugs([Category(name=name) for name in sorted(missing - self.categories.keys())], "name")
+        for category in Category.objects.bulk_create(new):
+            self.categories[category.name] = category
+
+
+def _read(source, fmt):
+    """Yield one dict per input row without reading the whole file."""
+    if fmt == "csv":
+        yield from csv.DictReader(source)
+        return
+    for line in source:
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as exc:
+            row = {"__error__": f"Invalid JSON: {exc}", "line": line.rstrip("\n")}
+        yield row if isinstance(row, dict) else {"__error__": "Expected a JSON object.", "line": line.rstrip("\n")}
+
+
+def _build_book(row):
+    """
+    Validate one input row without touching the database. Returns the unsaved
+    book with the author and category names it should be linked to.
+    """
+    if "__error__" in row:
+        raise ValidationError(row["__error__"])
+    author = str(row.get("author") or "").strip()
+    category = str(row.get("category") or "").strip()
+    errors = {}
+    for name, value, field in (
+        ("author", author, Author._meta.get_field("full_name")),
+        ("category", category, Category._meta.get_field("name")),
+    ):
+        if not value:
+            errors[name] = "This field is required."
+        elif len(value) > field.max_length:
+            errors[name] = f"Ensure this value has at most {field.max_length} characters."
+    if errors:
+        raise ValidationError(errors)
+
+    values = {name: row[name] for name in BOOK_FIELDS if row.get(name) not in (None, "")}
+    # New titles have nothing on loan.
+    values.setdefault("available_copies", values.get("total_copies", 1))
+    book = Book(**values)
+    # Links are resolved from the name maps, so no foreign key lookups here.
+    book.full_clean(exclude=["author", "category"], validate_unique=False, validate_constraints=False)
+    return book, author, category
+
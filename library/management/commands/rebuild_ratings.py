@@ -0,0 +1,87 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Sum
+
+from library.models import Book
+from reviews.models import RatingBucket, Review
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the stored rating aggregates (total, count, average) and star histogram "
+        "buckets of every book from its reviews."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="Books updated per bulk_update batch.")
+        parser.add_argument("--dry-run", action="store_true", help="Report drift without writing anything.")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        dry_run = options["dry_run"]
+
+        # One grouped pass over the reviews table.
+        actual = {
+            row["book_id"]: (row["rating_total"], row["review_count"])
+            for row in Review.objects.order_by()
+            .values("book_id")
+            .annotate(rating_total=Sum("stars"), review_count=Count("id"))
+        }
+
+        fields = ["rating_total", "review_count", "avg_rating"]
+        books = Book.objects.order_by("pk").only("id", *fields)
+        drifted = []
+        fixed = 0
+        for book in books.iterator(chunk_size=batch_size):
+            rating_total, review_count = actual.get(book.pk, (0, 0))
+            avg_rating = Book.compute_avg_rating(rating_total, review_count)
+            if (book.rating_total, book.review_count, book.avg_rating) == (rating_total, review_count, avg_rating):
+                continue
+            book.rating_total = rating_total
+            book.review_count = review_count
+            book.avg_rating = avg_rating
+            drifted.append(book)
+            if len(drifted) >= batch_size:
+                fixed += self._flush(drifted, fields, dry_run)
+                drifted = []
+        fixed += self._flush(drifted, fields, dry_run)
+
+        verb = "would be repaired" if dry_run else "repaired"
+        self.stdout.write(self.style.SUCCESS(f"{fixed} book rating aggregate(s) {verb}."))
+
+        fixed = self._rebuild_buckets(batch_size, dry_run)
+        self.stdout.write(self.style.SUCCESS(f"{fixed} rating histogram bucket(s) {verb}."))
+
+    def _rebuild_buckets(self, batch_size, dry_run):
+        actual = {
+            (row["book_id"], row["stars"]): row["count"]
+            for row in Review.objects.order_by().values("book_id", "stars").annotate(count=Count("id"))
+        }
+        to_update = []
+        to_delete = []
+        for bucket in RatingBucket.objects.order_by().iterator(chunk_size=batch_size):
+            count = actual.pop((bucket.book_id, bucket.stars), 0)
+            if not count:
+                if bucket.count:
+                    to_delete.append(bucket.pk)
+            elif count != bucket.count:
+                bucket.count = count
+                to_update.append(bucket)
+        to_create = [
+            RatingBucket(book_id=book_id, stars=stars, count=count) for (book_id, stars), count in actual.items()
+        ]
+
+        if not dry_run:
+            with transaction.atomic():
+                for start in range(0, len(to_delete), batch_size):
+                    RatingBucket.objects.filter(pk__in=to_delete[start : start + batch_size]).delete()
+                RatingBucket.objects.bulk_update(to_update, ["count"], batch_size=batch_size)
+                RatingBucket.objects.bulk_create(to_create, batch_size=batch_size)
+        return len(to_update) + len(to_delete) + len(to_create)
+
+    def _flush(self, books, fields, dry_run):
+        if not books or dry_run:
+            return len(books)
+        with transaction.atomic():
+            Book.objects.bulk_update(books, fields)
+        return len(books)
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+
+from library.models import Author, Category, book_count_subquery, recount_book_counts
+
+
+class Command(BaseCommand):
+    help = "Find and fix drift in the stored book_count of authors and categories."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Report drift without writing anything.")
+
+    def handle(self, *args, **options):
+        for model, fk_name, label in ((Category, "category", "Categories"), (Author, "author", "Authors")):
+            with transaction.atomic():
+                drifted = model.objects.alias(actual=book_count_subquery(fk_name)).exclude(book_count=F("actual"))
+                if not drifted.exists():
+                    self.stdout.write(f"{label}: no drift.")
+                    continue
+                if options["dry_run"]:
+                    self.stdout.write(self.style.WARNING(f"{label}: {drifted.count()} with drift."))
+                    continue
+                fixed = recount_book_counts(drifted, fk_name)
+            self.stdout.write(self.style.SUCCESS(f"{label}: repaired {fixed}."))
@@ -1,6 +1,19 @@
+import mimetypes
+from pathlib import Path
+from urllib.parse import urlparse
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, HttpResponseNotModified
 from django.utils import timezone
+from django.utils._os import safe_join
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date
+from django.views.static import was_modified_since
 
 from .models import PageVisit
+from .storage import ENCODINGS
 
 
 class PageVisitMiddleware:
@@ -30,3 +43,90 @@ class PageVisitMiddleware:
 
         response = self.get_response(request)
         return response
+
+
+class PrecompressedStaticFilesMiddleware:
+    """
+    Serves collected static files from STATIC_ROOT in-process, picking the
+    precompressed variant written by library.storage that the client accepts.
+    Content-hashed names are immutable and cached for a year; other files get
+    a short max-age. Place it right after SecurityMiddleware, so static
+    responses still get its headers and skip everything else; it is a no-op
+    while SERVE_STATIC is off (runserver already serves static files in DEBUG).
+    """
+
+    IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+    MUTABLE_MAX_AGE = 60
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, "SERVE_STATIC", not settings.DEBUG) and bool(settings.STATIC_ROOT)
+        self.prefix = urlparse(settings.STATIC_URL).path
+        if not self.prefix.startswith("/"):
+            self.prefix = "/" + self.prefix
+        self._immutable_names = None
+
+    def __call__(self, request):
+        if self.enabled and request.method in ("GET", "HEAD") and request.path.startswith(self.prefix):
+            response = self.serve(request, request.path[len(self.prefix):])
+            if response is not None:
+                return response
+        return self.get_response(request)
+
+    def serve(self, request, name):
+        try:
+            path = Path(safe_join(settings.STATIC_ROOT, name))
+        except SuspiciousFileOperation:
+            return None
+        if not path.is_file():
+            return None
+
+        encoding = None
+        served = path
+        accepted = parse_accept_encoding(request.headers.get("Accept-Encoding", ""))
+        for suffix, (candidate, _compress) in ENCODINGS.items():
+            variant = path.with_name(path.name + suffix)
+            if candidate in accepted and variant.is_file():
+                encoding, served = candidate, variant
+                break
+
+        stat = served.stat()
+        if not was_modified_since(request.headers.get("If-Modified-Since"), stat.st_mtime):
+            response = HttpResponseNotModified()
+        else:
+            content_type, _ = mimetypes.guess_type(str(path))
+            response = FileResponse(served.open("rb"), content_type=content_type or "application/octet-stream")
+            response["Content-Length"] = str(stat.st_size)
+            if encoding:
+                response["Content-Encoding"] = encoding
+        response["Last-Modified"] = http_date(stat.st_mtime)
+        patch_vary_headers(response, ["Accept-Encoding"])
+        if name in self.immutable_names():
+            response["Cache-Control"] = f"public, max-age={self.IMMUTABLE_MAX_AGE}, immutable"
+        else:
+            response["Cache-Control"] = f"public, max-age={self.MUTABLE_MAX_AGE}"
+        return response
+
+    def immutable_names(self):
+        if self._immutable_names is None:
+            self._immutable_names = set(getattr(staticfiles_storage, "hashed_files", {}).values())
+        return self._immutable_names
+
+
+def parse_accept_encoding(header):
+    """Encodings the client accepts (q > 0), lower-cased."""
+    accepted = set()
+    for part in header.split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        quality = params.strip()
+        if quality.startswith("q="):
+            try:
+                if float(quality[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(token)
+    return accepted
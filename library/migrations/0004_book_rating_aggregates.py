@@ -0,0 +1,54 @@
+# Generated by Django 6.0.1 on 2026-10-18 05:45
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_rating_aggregates(apps, schema_editor):
+    Book = apps.get_model("library", "Book")
+    Review = apps.get_model("reviews", "Review")
+    totals = (
+        Review.objects.order_by()
+        .values("book_id")
+        .annotate(rating_total=Sum("stars"), review_count=Count("id"))
+    )
+    for row in totals:
+        avg_rating = (row["rating_total"] / row["review_count"]).quantize(Decimal("0.01"))
+        Book.objects.filter(pk=row["book_id"]).update(
+            rating_total=row["rating_total"],
+            review_count=row["review_count"],
+            avg_rating=avg_rating,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0003_pagevisit'),
+        ('reviews', '0002_alter_review_stars'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='avg_rating',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=3),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='rating_total',
+            field=models.DecimalField(decimal_places=1, default=0, editable=False, max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='review_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['-avg_rating', '-review_count', '-created_at'], name='library_boo_avg_rat_183804_idx'),
+        ),
+        migrations.RunPython(backfill_rating_aggregates, migrations.RunPython.noop),
+    ]
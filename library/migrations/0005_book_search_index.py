@@ -0,0 +1,32 @@
+# Generated by Django 6.0.1 on 2026-10-18 09:12
+
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    from library import search
+
+    if search.create_index(schema_editor):
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {search.FTS_TABLE} (rowid, title, author_name, description) "
+                "SELECT b.id, b.title, a.full_name, b.description "
+                "FROM library_book b JOIN library_author a ON a.id = b.author_id"
+            )
+
+
+def drop_search_index(apps, schema_editor):
+    from library import search
+
+    search.drop_index(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0004_book_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
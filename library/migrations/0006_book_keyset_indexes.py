@@ -0,0 +1,25 @@
+# Generated by Django 6.0.1 on 2026-10-18 09:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0005_book_search_index'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='book',
+            name='library_boo_avg_rat_183804_idx',
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['created_at', 'id'], name='library_boo_created_5fc9b3_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['-avg_rating', '-review_count', '-created_at', '-id'], name='library_boo_avg_rat_7016e2_idx'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 6.0.1 on 2026-10-18 10:05
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_book_counts(apps, schema_editor):
+    Book = apps.get_model("library", "Book")
+    for model_name, fk_name in (("Author", "author"), ("Category", "category")):
+        counts = (
+            Book.objects.filter(**{fk_name: OuterRef("pk")})
+            .order_by()
+            .values(fk_name)
+            .annotate(total=Count("pk"))
+            .values("total")
+        )
+        apps.get_model("library", model_name).objects.update(
+            book_count=Coalesce(Subquery(counts, output_field=models.PositiveIntegerField()), Value(0))
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0006_book_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='author',
+            name='book_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='book_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_book_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 6.0.1 on 2026-10-18 11:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0008_catalog_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='book',
+            constraint=models.CheckConstraint(condition=models.Q(('available_copies__gte', 0)), name='book_available_copies_non_negative', violation_error_message='Available copies cannot be negative.'),
+        ),
+        migrations.AddConstraint(
+            model_name='book',
+            constraint=models.CheckConstraint(condition=models.Q(('available_copies__lte', models.F('total_copies'))), name='book_available_copies_within_total', violation_error_message='Available copies cannot exceed total copies.'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 6.0.1 on 2026-10-18 13:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0009_loan_invariants'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='author',
+            index=models.Index(fields=['full_name'], name='library_aut_full_na_912894_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 6.0.1 on 2026-10-18 13:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0010_admin_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['category', 'created_at', 'id'], name='library_boo_categor_46fef9_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['author', 'created_at', 'id'], name='library_boo_author__f75a94_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 6.0.1 on 2026-10-18 14:15
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0012_import_checkpoint'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='author',
+            name='updated_at',
+        ),
+        migrations.RemoveField(
+            model_name='book',
+            name='updated_at',
+        ),
+        migrations.RemoveField(
+            model_name='category',
+            name='updated_at',
+        ),
+    ]
@@ -1,13 +1,20 @@
+from decimal import Decimal
+
 from django.conf import settings
 from django.core.exceptions import ValidationError
-from django.db import models
-from django.utils.text import slugify
+from django.db import IntegrityError, models, transaction
+from django.db.models import Count, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .slugs import SlugAllocatingMixin
 
 
-class Category(models.Model):
+class Category(SlugAllocatingMixin, models.Model):
     name = models.CharField(max_length=100, unique=True)
     icon = models.CharField(max_length=100, blank=True, null=True)
     slug = models.SlugField(max_length=120, unique=True, blank=True, editable=False)
+    # Maintained by library.signals whenever books are added, removed or moved.
+    book_count = models.PositiveIntegerField(default=0, editable=False)
 
     class Meta:
         ordering = ["name"]
@@ -16,29 +23,18 @@ class Category(models.Model):
     def __str__(self) -> str:  # pragma: no cover - trivial
         return self.name
 
-    def save(self, *args, **kwargs):
-        if not self.slug:
-            self.slug = self._generate_unique_slug()
-        super().save(*args, **kwargs)
-
-    def _generate_unique_slug(self) -> str:
-        base_slug = slugify(self.name)
-        slug_candidate = base_slug
-        counter = 1
-        while Category.objects.filter(slug=slug_candidate).exclude(pk=self.pk).exists():
-            slug_candidate = f"{base_slug}-{counter}"
-            counter += 1
-        return slug_candidate
-
 
 class Author(models.Model):
     full_name = models.CharField(max_length=150)
     photo = models.ImageField(upload_to="authors/photos/", blank=True, null=True)
     bio = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Maintained by library.signals whenever books are added, removed or moved.
+    book_count = models.PositiveIntegerField(default=0, editable=False)
 
     class Meta:
         ordering = ["full_name"]
+        indexes = [models.Index(fields=["full_name"])]
 
     def __str__(self) -> str:  # pragma: no cover - trivial
         return self.full_name
@@ -55,11 +51,34 @@ class Book(models.Model):
     pages = models.PositiveIntegerField(blank=True, null=True)
     total_copies = models.PositiveIntegerField(default=1)
     available_copies = models.PositiveIntegerField(default=1)
+    # Review aggregates, maintained by reviews.signals on every review write.
+    rating_total = models.DecimalField(max_digits=10, decimal_places=1, default=0, editable=False)
+    review_count = models.PositiveIntegerField(default=0, editable=False)
+    avg_rating = models.DecimalField(max_digits=3, decimal_places=2, default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         ordering = ["title", "author__full_name"]
-        indexes = [models.Index(fields=["title"])]
+        indexes = [
+            models.Index(fields=["title"]),
+            models.Index(fields=["created_at", "id"]),
+            # Newest-first cursor pages of one category's or author's books.
+            models.Index(fields=["category", "created_at", "id"]),
+            models.Index(fields=["author", "created_at", "id"]),
+            models.Index(fields=["-avg_rating", "-review_count", "-created_at", "-id"]),
+        ]
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(available_copies__gte=0),
+                name="book_available_copies_non_negative",
+                violation_error_message="Available copies cannot be negative.",
+            ),
+            models.CheckConstraint(
+                condition=models.Q(available_copies__lte=F("total_copies")),
+                name="book_available_copies_within_total",
+                violation_error_message="Available copies cannot exceed total copies.",
+            ),
+        ]
 
     def __str__(self) -> str:  # pragma: no cover - trivial
         return self.title
@@ -72,10 +91,187 @@ class Book(models.Model):
             if self.available_copies > self.total_copies:
                 raise ValidationError({"available_copies": "Available copies cannot exceed total copies."})
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember which author/category counters currently include this book.
+        instance._stored_parents = (instance.__dict__.get("author_id"), instance.__dict__.get("category_id"))
+        return instance
+
     def save(self, *args, **kwargs):
-        # Ensure validation rules run when saving via the ORM.
-        self.full_clean()
-        super().save(*args, **kwargs)
+        # Ensure validation rules run when saving via the ORM. clean() covers
+        # the copy constraints without a query; the database enforces them.
+        clean_for_save(self, kwargs.get("update_fields"))
+        # Keep the row and the author/category book counters in one transaction.
+        try:
+            with transaction.atomic():
+                super().save(*args, **kwargs)
+        except IntegrityError as exc:
+            # Another writer moved the copy counts after clean() ran.
+            for constraint in self._meta.constraints:
+                if constraint.name in str(exc):
+                    raise ValidationError(
+                        {"available_copies": constraint.violation_error_message}
+                    ) from exc
+            raise
+
+    @staticmethod
+    def compute_avg_rating(rating_total, review_count) -> Decimal:
+        if not review_count:
+            return Decimal("0")
+        return (Decimal(rating_total) / review_count).quantize(Decimal("0.01"))
+
+    @classmethod
+    def apply_review_delta(cls, book_id, stars_delta, count_delta):
+        """
+        Shift the stored rating aggregates of one book by a review write.
+        The increment runs as a single UPDATE so concurrent reviews never
+        lose each other's changes; the average is then derived from the
+        updated row inside the same transaction.
+        """
+        with transaction.atomic():
+            cls.objects.filter(pk=book_id).update(
+                rating_total=F("rating_total") + stars_delta,
+                review_count=F("review_count") + count_delta,
+            )
+            row = cls.objects.filter(pk=book_id).values_list("rating_total", "review_count").first()
+            if row is None:
+                return
+            cls.objects.filter(pk=book_id).update(avg_rating=cls.compute_avg_rating(*row))
+
+    @classmethod
+    def reserve_copy(cls, book_id) -> bool:
+        """
+        Take one available copy. The availability check and the decrement
+        are the same conditional UPDATE, so concurrent checkouts can never
+        oversell and nobody waits on a row lock. Returns False when no copy
+        was left.
+        """
+        return cls._shift_available_copies(book_id, -1, available_copies__gt=0)
+
+    @classmethod
+    def release_copy(cls, book_id) -> bool:
+        """Put one copy back, never going above ``total_copies``."""
+        return cls._shift_available_copies(book_id, 1, available_copies__lt=F("total_copies"))
+
+    @classmethod
+    def _shift_available_copies(cls, book_id, delta, **guard) -> bool:
+        from .conditional import bump_catalog_version
+
+        updated = cls.objects.filter(pk=book_id, **guard).update(available_copies=F("available_copies") + delta)
+        if updated:
+            # Queryset updates send no post_save, so the catalog version is bumped here.
+            bump_catalog_version()
+        return updated == 1
+
+    @classmethod
+    def refresh_rating(cls, book_id):
+        """Recount the rating aggregates of one book from its reviews."""
+        from reviews.models import Review
+
+        totals = Review.objects.filter(book_id=book_id).aggregate(
+            rating_total=Coalesce(
+                Sum("stars"), Value(0, output_field=models.DecimalField(max_digits=10, decimal_places=1))
+            ),
+            review_count=Count("id"),
+        )
+        cls.objects.filter(pk=book_id).update(
+            avg_rating=cls.compute_avg_rating(totals["rating_total"], totals["review_count"]),
+            **totals,
+        )
+
+
+def clean_for_save(instance, update_fields=None):
+    """
+    full_clean() for ORM saves without the queries the database makes
+    redundant: only the fields in ``update_fields`` are validated, foreign
+    keys whose row is already loaded on the instance are not looked up again,
+    and constraints are left to the database. ModelForms (and so the admin)
+    still run the complete full_clean() before they save.
+    """
+    exclude = set()
+    for field in instance._meta.concrete_fields:
+        if update_fields is not None and field.name not in update_fields and field.attname not in update_fields:
+            exclude.add(field.name)
+        elif field.is_relation and field.is_cached(instance):
+            related = field.get_cached_value(instance)
+            if related is not None and not related._state.adding:
+                exclude.add(field.name)
+    instance.full_clean(exclude=exclude, validate_constraints=False)
+
+
+def book_count_subquery(fk_name):
+    """Correlated COUNT(*) of books pointing at the outer Author/Category row."""
+    counts = (
+        Book.objects.filter(**{fk_name: OuterRef("pk")})
+        .order_by()
+        .values(fk_name)
+        .annotate(total=Count("pk"))
+        .values("total")
+    )
+    return Coalesce(Subquery(counts, output_field=models.PositiveIntegerField()), Value(0))
+
+
+def recount_book_counts(queryset, fk_name):
+    """
+    Reset ``book_count`` for every Author/Category in ``queryset`` with one
+    UPDATE ... SET book_count = (SELECT COUNT(*) ...). Returns rows updated.
+    """
+    return queryset.update(book_count=book_count_subquery(fk_name))
+
+
+def adjust_copies(queryset, delta):
+    """
+    Add ``delta`` copies (remove them when negative) to every book in
+    ``queryset`` with one UPDATE that moves ``total_copies`` and
+    ``available_copies`` together, so copies on loan stay accounted for.
+    Books with fewer than ``-delta`` copies on the shelf are left unchanged,
+    and added copies go to waiting holds first, as returned copies do.
+    Returns (adjusted, rejected) lists of books.
+    """
+    from borrowing.models import Hold, hand_shelved_copies_to_holds
+
+    from .conditional import bump_catalog_version
+
+    guard = models.Q(available_copies__gte=-delta) if delta < 0 else models.Q()
+    books = queryset.select_related(None).order_by("pk").only("id", "title", "total_copies", "available_copies")
+    with transaction.atomic():
+        # The rows stay locked until the UPDATE, so the split read here is the one it applies.
+        selected = list(books.select_for_update())
+        rejected = [book for book in selected if book.available_copies + delta < 0]
+        adjusted = [book for book in selected if book.available_copies + delta >= 0]
+        updated = queryset.filter(guard).update(
+            total_copies=F("total_copies") + delta,
+            available_copies=F("available_copies") + delta,
+        )
+        if updated:
+            # Queryset updates send no post_save, so the catalog version is bumped here.
+            bump_catalog_version()
+        handed = {}
+        if delta > 0:
+            waiting = Hold.objects.filter(book_id__in=[book.pk for book in adjusted], status=Hold.WAITING)
+            for book_id in set(waiting.values_list("book_id", flat=True)):
+                handed[book_id] = hand_shelved_copies_to_holds(book_id, delta)
+    for book in adjusted:
+        book.total_copies += delta
+        book.available_copies += delta - handed.get(book.pk, 0)
+    return adjusted, rejected
+
+
+class ImportCheckpoint(models.Model):
+    """
+    Progress of an import_catalog run, saved in the transaction of each
+    batch so an interrupted import resumes right after its last commit.
+    """
+
+    source = models.CharField(max_length=500, unique=True)
+    records = models.PositiveIntegerField(default=0)
+    imported = models.PositiveIntegerField(default=0)
+    rejected = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self) -> str:  # pragma: no cover - trivial
+        return f"{self.source} after {self.records} rows"
 
 
 class ContactMessage(models.Model):
@@ -0,0 +1,141 @@
+"""
+Full-text search over the book catalog.
+
+On SQLite the catalog is indexed in an FTS5 virtual table (title, author
+name, description) keyed by the book id, and matches are ranked with bm25.
+Other backends fall back to case-insensitive containment filters.
+"""
+import re
+
+from django.db import DatabaseError, connection
+from django.db.models import Q, Value
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = "library_book_fts"
+
+# Column weights for bm25(): title matches count most, description least.
+RANK_SQL = f"bm25({FTS_TABLE}, 10.0, 5.0, 1.0)"
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+_available = {}
+
+
+def create_index(schema_editor=None):
+    """Create the FTS5 table if the backend supports it. Returns True on success."""
+    conn = schema_editor.connection if schema_editor else connection
+    if conn.vendor != "sqlite":
+        return False
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+                "USING fts5(title, author_name, description, tokenize='unicode61 remove_diacritics 2')"
+            )
+    except DatabaseError:
+        # SQLite built without FTS5; searches use the fallback filters.
+        return False
+    _available.pop(conn.alias, None)
+    return True
+
+
+def drop_index(schema_editor=None):
+    conn = schema_editor.connection if schema_editor else connection
+    if conn.vendor == "sqlite":
+        with conn.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+    _available.pop(conn.alias, None)
+
+
+def is_available() -> bool:
+    if connection.alias not in _available:
+        _available[connection.alias] = (
+            connection.vendor == "sqlite" and FTS_TABLE in connection.introspection.table_names()
+        )
+    return _available[connection.alias]
+
+
+def _reindex(where_sql="", params=()):
+    with connection.cursor() as cursor:
+        if where_sql:
+            cursor.execute(
+                f"DELETE FROM {FTS_TABLE} WHERE rowid IN (SELECT b.id FROM library_book b WHERE {where_sql})",
+                params,
+            )
+        else:
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, title, author_name, description) "
+            "SELECT b.id, b.title, a.full_name, b.description "
+            "FROM library_book b JOIN library_author a ON a.id = b.author_id"
+            + (f" WHERE {where_sql}" if where_sql else ""),
+            params,
+        )
+
+
+def index_book(book_id):
+    if is_available():
+        _reindex("b.id = %s", [book_id])
+
+
+def index_books(book_ids):
+    """Index a batch of books, e.g. rows added with bulk_create(), which sends no post_save."""
+    if is_available() and book_ids:
+        _reindex(f"b.id IN ({', '.join(['%s'] * len(book_ids))})", list(book_ids))
+
+
+def index_author_books(author_id):
+    if is_available():
+        _reindex("b.author_id = %s", [author_id])
+
+
+def remove_book(book_id):
+    if is_available():
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [book_id])
+
+
+def rebuild_index():
+    """Repopulate the whole index from the books table. Returns False if unsupported."""
+    if not is_available() and not create_index():
+        return False
+    _reindex()
+    with connection.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+    return True
+
+
+def build_match_expression(query: str) -> str:
+    """
+    Turn free text into a safe FTS5 expression: every word becomes a quoted
+    prefix term, so punctuation or FTS operators typed by users never reach
+    the query parser and partially typed words still match.
+    """
+    return " ".join(f'"{token}"*' for token in _TOKEN_RE.findall(query))
+
+
+def search_books(queryset, query: str):
+    """
+    Filter a Book queryset by a free-text query. On the FTS backend the result
+    is annotated with ``search_rank`` (lower is more relevant).
+    """
+    if is_available():
+        match = build_match_expression(query)
+        if not match:
+            return queryset.annotate(search_rank=Value(0.0)).none()
+        table = queryset.model._meta.db_table
+        return queryset.filter(
+            pk__in=RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [match])
+        ).annotate(
+            search_rank=RawSQL(
+                f"SELECT {RANK_SQL} FROM {FTS_TABLE} "
+                f"WHERE {FTS_TABLE} MATCH %s AND {FTS_TABLE}.rowid = {table}.id",
+                [match],
+            )
+        )
+
+    return queryset.filter(
+        Q(title__icontains=query)
+        | Q(author__full_name__icontains=query)
+        | Q(description__icontains=query)
+    )
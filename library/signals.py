@@ -0,0 +1,134 @@
+from django.conf import settings
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import cache as section_cache
+from . import search
+from .conditional import bump_catalog_version
+from .models import Author, Book, Category, recount_book_counts
+
+
+@receiver(post_save, sender=Book)
+def index_saved_book(sender, instance, update_fields=None, **kwargs):
+    # Counter-only updates (availability, ratings) never touch indexed text.
+    if update_fields is not None and not {"title", "description", "author"} & set(update_fields):
+        return
+    search.index_book(instance.pk)
+
+
+@receiver(post_delete, sender=Book)
+def unindex_deleted_book(sender, instance, **kwargs):
+    search.remove_book(instance.pk)
+
+
+@receiver(post_save, sender=Author)
+def reindex_author_books(sender, instance, created, update_fields=None, **kwargs):
+    if created:
+        return
+    if update_fields is not None and "full_name" not in update_fields:
+        return
+    search.index_author_books(instance.pk)
+
+
+# Home page sections -----------------------------------------------------
+
+HOME_BOOK_SECTIONS = (section_cache.HOME_LATEST_BOOKS, section_cache.HOME_TOP_RATED_BOOKS)
+
+
+@receiver(post_save, sender=Book)
+def invalidate_home_on_book_save(sender, instance, created, update_fields=None, **kwargs):
+    # Availability changes on checkout/return don't show on the home page.
+    if update_fields is not None and set(update_fields) <= {"available_copies"}:
+        return
+    if created:
+        section_cache.invalidate(*HOME_BOOK_SECTIONS, section_cache.HOME_STATS)
+    else:
+        section_cache.invalidate(*HOME_BOOK_SECTIONS)
+
+
+@receiver(post_save, sender=Author)
+@receiver(post_save, sender=Category)
+def invalidate_home_on_name_change(sender, instance, created, **kwargs):
+    # Book cards show author and category names.
+    if created:
+        section_cache.invalidate(section_cache.HOME_STATS)
+    else:
+        section_cache.invalidate(*HOME_BOOK_SECTIONS)
+
+
+@receiver(post_delete, sender=Book)
+@receiver(post_delete, sender=Author)
+@receiver(post_delete, sender=Category)
+def invalidate_home_on_catalog_delete(sender, instance, **kwargs):
+    section_cache.invalidate(*HOME_BOOK_SECTIONS, section_cache.HOME_STATS)
+
+
+@receiver(post_save, sender="reviews.Review")
+@receiver(post_delete, sender="reviews.Review")
+def invalidate_home_on_review_change(sender, instance, **kwargs):
+    section_cache.invalidate(*HOME_BOOK_SECTIONS)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_home_on_user_created(sender, instance, created, **kwargs):
+    if created:
+        section_cache.invalidate(section_cache.HOME_STATS)
+
+
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def invalidate_home_on_user_deleted(sender, instance, **kwargs):
+    section_cache.invalidate(section_cache.HOME_STATS)
+
+
+# Author / category book counters ------------------------------------------
+
+def _shift_book_count(model, pk, delta):
+    if pk is not None:
+        model.objects.filter(pk=pk).update(book_count=F("book_count") + delta)
+
+
+@receiver(post_save, sender=Book)
+def count_saved_book(sender, instance, created, update_fields=None, **kwargs):
+    if update_fields is not None and not {"author", "category"} & set(update_fields):
+        return
+
+    if created:
+        _shift_book_count(Author, instance.author_id, 1)
+        _shift_book_count(Category, instance.category_id, 1)
+    else:
+        previous_author_id, previous_category_id = getattr(instance, "_stored_parents", (None, None))
+        if previous_author_id is None or previous_category_id is None:
+            # Saved without a loaded original; recount the current parents.
+            recount_book_counts(Author.objects.filter(pk=instance.author_id), "author")
+            recount_book_counts(Category.objects.filter(pk=instance.category_id), "category")
+        else:
+            if previous_author_id != instance.author_id:
+                _shift_book_count(Author, previous_author_id, -1)
+                _shift_book_count(Author, instance.author_id, 1)
+            if previous_category_id != instance.category_id:
+                _shift_book_count(Category, previous_category_id, -1)
+                _shift_book_count(Category, instance.category_id, 1)
+
+    instance._stored_parents = (instance.author_id, instance.category_id)
+
+
+@receiver(post_delete, sender=Book)
+def uncount_deleted_book(sender, instance, **kwargs):
+    author_id, category_id = getattr(instance, "_stored_parents", (None, None))
+    _shift_book_count(Author, author_id or instance.author_id, -1)
+    _shift_book_count(Category, category_id or instance.category_id, -1)
+
+
+# Conditional GET version stamp ---------------------------------------------
+
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+@receiver(post_save, sender=Author)
+@receiver(post_delete, sender=Author)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender="reviews.Review")
+@receiver(post_delete, sender="reviews.Review")
+def bump_catalog_version_on_write(sender, instance, **kwargs):
+    bump_catalog_version()
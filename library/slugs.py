@@ -0,0 +1,79 @@
+"""
+Unique slug allocation for models with a ``slug`` field derived from another
+field (Category.name, and any model that mixes in SlugAllocatingMixin).
+
+Slugs are allocated from one prefix query per batch instead of an exists()
+query per candidate suffix, and a save that still loses a race on the
+unique constraint is retried with a fresh allocation.
+"""
+from django.db import IntegrityError, models, transaction
+from django.utils.text import slugify
+
+SLUG_SAVE_ATTEMPTS = 3
+
+
+def allocate_slugs(instances, source_field, slug_field="slug"):
+    """
+    Give every instance in ``instances`` without a slug a unique one built
+    from ``source_field``: the slugified value, or the first free "-N" suffix
+    of it. One query reads the taken slugs for the whole batch, and slugs
+    handed out within the batch count as taken, so the result can go
+    straight to bulk_create(). Returns ``instances``.
+    """
+    pending = [instance for instance in instances if not getattr(instance, slug_field)]
+    if not pending:
+        return instances
+    model = type(pending[0])
+    max_length = model._meta.get_field(slug_field).max_length
+    # Room for a "-N" suffix within the column.
+    bases = {
+        id(instance): slugify(getattr(instance, source_field))[: max_length - 8].strip("-") or model._meta.model_name
+        for instance in pending
+    }
+    taken = _taken_slugs(model, slug_field, set(bases.values()), exclude_pks=[obj.pk for obj in pending if obj.pk])
+
+    for instance in pending:
+        base = slug = bases[id(instance)]
+        counter = 1
+        while slug in taken:
+            slug = f"{base}-{counter}"
+            counter += 1
+        taken.add(slug)
+        setattr(instance, slug_field, slug)
+    return instances
+
+
+def _taken_slugs(model, slug_field, bases, exclude_pks=()):
+    """Slugs in the table equal to or starting with any of ``bases``, in one query."""
+    prefixes = models.Q()
+    for base in bases:
+        prefixes |= models.Q(**{f"{slug_field}__startswith": base})
+    queryset = model._default_manager.filter(prefixes)
+    if exclude_pks:
+        queryset = queryset.exclude(pk__in=exclude_pks)
+    return set(queryset.values_list(slug_field, flat=True))
+
+
+class SlugAllocatingMixin:
+    """
+    Model mixin that allocates ``slug`` from ``slug_source`` on the first
+    save and retries with a new allocation when a concurrent save took the
+    same slug first.
+    """
+
+    slug_source = "name"
+
+    def save(self, *args, **kwargs):
+        if self.slug:
+            return super().save(*args, **kwargs)
+        for attempt in range(SLUG_SAVE_ATTEMPTS):
+            allocate_slugs([self], self.slug_source)
+            try:
+                with transaction.atomic():
+                    return super().save(*args, **kwargs)
+            except IntegrityError:
+                slug, self.slug = self.slug, ""
+                lost_race = type(self)._default_manager.filter(slug=slug).exclude(pk=self.pk).exists()
+                if not lost_race or attempt == SLUG_SAVE_ATTEMPTS - 1:
+                    self.slug = slug
+                    raise
@@ -0,0 +1,62 @@
+"""
+Static files storage for production builds.
+
+``collectstatic`` writes content-hashed copies of every asset (so they can
+be cached forever) plus precompressed siblings of text assets: ``.gz``
+always, and ``.br`` when the optional ``brotli`` package is installed or a
+zlib ``.zz`` (HTTP "deflate") otherwise. PrecompressedStaticFilesMiddleware
+serves those variants without compressing anything at request time.
+"""
+import gzip
+import zlib
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, StaticFilesStorage
+from django.core.files.base import ContentFile
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = (".css", ".js", ".map", ".svg", ".json", ".txt", ".html", ".xml", ".ico")
+MIN_COMPRESS_SIZE = 256
+
+# Suffix -> (Content-Encoding, compressor), in server preference order.
+ENCODINGS = {}
+if brotli is not None:
+    ENCODINGS[".br"] = ("br", lambda data: brotli.compress(data, quality=11))
+ENCODINGS[".gz"] = ("gzip", lambda data: gzip.compress(data, compresslevel=9, mtime=0))
+if brotli is None:
+    ENCODINGS[".zz"] = ("deflate", lambda data: zlib.compress(data, 9))
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    def url(self, name, force=False):
+        # Before the first collectstatic there is no manifest (local runs,
+        # tests); serve plain names instead of failing every {% static %}.
+        if not self.hashed_files and not force:
+            return StaticFilesStorage.url(self, name)
+        return super().url(name, force)
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        names = set(paths) | set(self.hashed_files.values())
+        for name in sorted(names):
+            if name.endswith(COMPRESSIBLE_EXTENSIONS) and self.exists(name):
+                self._write_compressed(name)
+
+    def _write_compressed(self, name):
+        with self.open(name) as source:
+            data = source.read()
+        if len(data) < MIN_COMPRESS_SIZE:
+            return
+        for suffix, (_encoding, compress) in ENCODINGS.items():
+            compressed = compress(data)
+            if len(compressed) >= len(data):
+                continue
+            target = name + suffix
+            if self.exists(target):
+                self.delete(target)
+            self._save(target, ContentFile(compressed))
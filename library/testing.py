@@ -0,0 +1,24 @@
+"""Fixtures shared by the test suites of the library, borrowing and reviews apps."""
+from django.contrib.auth import get_user_model
+
+from .models import Author, Book, Category
+
+
+def create_user(username, **fields):
+    return get_user_model().objects.create_user(username, password="pass12345", **fields)
+
+
+def create_book(title="Book", copies=1, author=None, category=None, **fields):
+    """
+    A book with ``copies`` copies, all on the shelf. The author and category
+    are created by name when not given as instances.
+    """
+    if not isinstance(author, Author):
+        author, _ = Author.objects.get_or_create(full_name=author or "Test Author")
+    if not isinstance(category, Category):
+        category, _ = Category.objects.get_or_create(name=category or "Test Category")
+    fields.setdefault("description", "d")
+    fields.setdefault("language", "English")
+    return Book.objects.create(
+        title=title, author=author, category=category, total_copies=copies, available_copies=copies, **fields
+    )
@@ -1,3 +1,574 @@
-from django.test import TestCase
+import gzip
+import html
+import json
+import os
+import re
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from borrowing.models import BorrowRecord, Hold
+
+from . import cache as section_cache
+from . import search, slugs
+from .middleware import PrecompressedStaticFilesMiddleware, parse_accept_encoding
+from .models import Author, Book, Category, ImportCheckpoint, adjust_copies
+from .pagination import CursorPaginator
+from .storage import ENCODINGS
+from .testing import create_book, create_user
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.book = create_book("Tides", author="Ana Sea", category="Oceans")
+
+    def get(self, url, **headers):
+        return self.client.get(url, headers=headers)
+
+    def rename(self, obj, field, value):
+        setattr(obj, field, value)
+        with self.captureOnCommitCallbacks(execute=True):
+            obj.save()
+
+    def assertRevalidates(self, url, change):
+        first = self.get(url)
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(self.get(url, if_none_match=first["ETag"]).status_code, 304)
+        change()
+        self.assertEqual(self.get(url, if_none_match=first["ETag"]).status_code, 200)
+
+    def test_category_page_changes_with_its_books(self):
+        url = reverse("library:category_detail", args=[self.book.category.slug])
+        self.assertRevalidates(url, lambda: self.rename(self.book, "title", "Currents"))
+
+    def test_book_page_changes_with_its_author(self):
+        url = reverse("library:book_detail", args=[self.book.pk])
+        self.assertRevalidates(url, lambda: self.rename(self.book.author, "full_name", "Ana Ocean"))
+
+    def test_if_modified_since_alone_never_gets_a_304(self):
+        url = reverse("library:author_detail", args=[self.book.author.pk])
+        response = self.get(url)
+        self.assertNotIn("Last-Modified", response)
+        self.assertEqual(self.get(url, if_modified_since="Fri, 01 Jan 2100 00:00:00 GMT").status_code, 200)
+
+    def test_personalized_pages_vary_on_cookie(self):
+        self.client.force_login(create_user("viewer"))
+        anonymous_etag = self.client_class().get(reverse("library:book_detail", args=[self.book.pk]))["ETag"]
+        response = self.get(reverse("library:book_detail", args=[self.book.pk]))
+        self.assertIn("Cookie", response["Vary"])
+        self.assertNotEqual(response["ETag"], anonymous_etag)
+
+
+class DetailPageCursorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.books = [create_book(f"Volume {n}", author="Cy Writer", category="Essays") for n in range(15)]
+        now = timezone.now()
+        for age, book in enumerate(reversed(cls.books)):
+            Book.objects.filter(pk=book.pk).update(created_at=now - timedelta(hours=age))
+        create_book("Elsewhere", author="Other Writer", category="Other")
+        cls.category, cls.author = cls.books[0].category, cls.books[0].author
+
+    def titles(self, response):
+        return [book.title for book in response.context["page_obj"]]
+
+    def test_load_more_link_pages_without_javascript(self):
+        url = reverse("library:category_detail", args=[self.category.slug])
+        first = self.client.get(url)
+        self.assertEqual(self.titles(first), [f"Volume {n}" for n in range(14, 2, -1)])
+        link = re.search(r'href="(\?cursor=[^"]+)"', first.content.decode())
+        self.assertIsNotNone(link)
+
+        second = self.client.get(url + html.unescape(link.group(1)))
+        self.assertEqual(self.titles(second), ["Volume 2", "Volume 1", "Volume 0"])
+        self.assertNotContains(second, "Load more")
+
+    def test_fragment_continues_the_author_listing(self):
+        first = self.client.get(reverse("library:author_detail", args=[self.author.pk]))
+        fragment = self.client.get(
+            reverse("library:author_books_fragment", args=[self.author.pk]),
+            {"cursor": first.context["page_obj"].next_cursor},
+        )
+        self.assertTemplateUsed(fragment, "partials/author_books.html")
+        self.assertEqual(self.titles(fragment), ["Volume 2", "Volume 1", "Volume 0"])
+
+    def test_cursor_of_another_listing_restarts_at_the_first_page(self):
+        page = self.client.get(reverse("library:author_detail", args=[self.author.pk]))
+        foreign = self.client.get(
+            reverse("library:category_detail", args=[self.category.slug]),
+            {"cursor": page.context["page_obj"].next_cursor},
+        )
+        self.assertEqual(self.titles(foreign)[0], "Volume 14")
+
+    def test_pages_are_served_from_the_composite_indexes(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("checks the SQLite query plan")
+        for parent, index_prefix in ((self.category, "library_boo_categor"), (self.author, "library_boo_author_")):
+            with self.subTest(parent=parent):
+                books = Book.objects.filter(**{parent._meta.model_name: parent})
+                plan = books.order_by("-created_at", "-pk")[:13].explain()
+                self.assertIn(index_prefix, plan)
+                self.assertNotIn("TEMP B-TREE", plan)
+
+
+class CatalogSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.title_hit = create_book("Gardening Basics", author="Flo Bloom", description="Soil and seeds.")
+        cls.body_hit = create_book("Green Thumbs", author="Flo Bloom", description="A year of gardening.")
+        create_book("Sea Charts", author="Cap Tain", description="Navigation.")
+
+    def setUp(self):
+        if not search.is_available():
+            self.skipTest("needs SQLite with FTS5")
+
+    def titles(self, query):
+        return [book.title for book in search.search_books(Book.objects.all(), query).order_by("search_rank")]
+
+    def test_prefix_matches_ranked_title_first(self):
+        self.assertEqual(self.titles("garden"), ["Gardening Basics", "Green Thumbs"])
+
+    def test_operators_and_punctuation_are_quoted(self):
+        self.assertEqual(search.build_match_expression('sea OR "charts" -x'), '"sea"* "OR"* "charts"* "x"*')
+        self.assertEqual(self.titles("NEAR( sea"), [])
+        self.assertEqual(self.titles("!!!"), [])
+
+    def test_index_follows_book_and_author_writes(self):
+        self.title_hit.title = "Pruning Roses"
+        self.title_hit.save()
+        self.assertEqual(self.titles("pruning"), ["Pruning Roses"])
+
+        author = self.body_hit.author
+        author.full_name = "Iris Petal"
+        author.save()
+        self.assertEqual(sorted(self.titles("iris")), ["Green Thumbs", "Pruning Roses"])
+
+        self.body_hit.delete()
+        self.assertEqual(self.titles("iris"), ["Pruning Roses"])
+
+    def test_book_list_search(self):
+        response = self.client.get(reverse("library:book_list"), {"q": "navigation"})
+        self.assertEqual([book.title for book in response.context["page_obj"]], ["Sea Charts"])
+
+
+class CursorPaginatorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.books = [create_book(f"Page {n}") for n in range(5)]
+        # Ties on created_at and rating fall back to the primary key.
+        same_time = timezone.now()
+        Book.objects.update(created_at=same_time)
+        Book.objects.filter(pk__in=[cls.books[1].pk, cls.books[3].pk]).update(avg_rating="4.50", review_count=2)
+
+    def walk(self, paginator):
+        pages, token = [], None
+        while True:
+            page = paginator.get_page(token)
+            pages.append([book.title for book in page])
+            if not page.has_next:
+                return pages, page
+            token = page.next_cursor
+
+    def test_forward_and_back_over_ties(self):
+        paginator = CursorPaginator(Book.objects.all(), ["-created_at"], 2, key="test")
+        pages, last = self.walk(paginator)
+        self.assertEqual(pages, [["Page 4", "Page 3"], ["Page 2", "Page 1"], ["Page 0"]])
+
+        previous = paginator.get_page(last.previous_cursor)
+        self.assertEqual([book.title for book in previous], ["Page 2", "Page 1"])
+        self.assertTrue(previous.has_next and previous.has_previous)
+        first = paginator.get_page(previous.previous_cursor)
+        self.assertEqual([book.title for book in first], ["Page 4", "Page 3"])
+        self.assertFalse(first.has_previous)
+
+    def test_decimal_sort_keys_round_trip(self):
+        paginator = CursorPaginator(Book.objects.all(), ["-avg_rating", "-review_count", "-created_at"], 1, key="r")
+        pages, _last = self.walk(paginator)
+        self.assertEqual([page[0] for page in pages], ["Page 3", "Page 1", "Page 4", "Page 2", "Page 0"])
+
+    def test_tampered_or_foreign_cursors_restart_at_the_first_page(self):
+        paginator = CursorPaginator(Book.objects.all(), ["-created_at"], 2, key="test")
+        token = paginator.get_page().next_cursor
+        self.assertIsNotNone(paginator.decode_cursor(token))
+        self.assertIsNone(paginator.decode_cursor(token[:-2] + "xx"))
+        self.assertIsNone(paginator.decode_cursor("not-a-cursor"))
+        self.assertIsNone(CursorPaginator(Book.objects.all(), ["-created_at"], 2, key="other").decode_cursor(token))
+        self.assertEqual([book.title for book in paginator.get_page(token[:-2] + "xx")], ["Page 4", "Page 3"])
+
+    def test_book_list_keeps_numbered_pages_for_old_links(self):
+        cursor_page = self.client.get(reverse("library:book_list"))
+        self.assertTrue(cursor_page.context["cursor_mode"])
+        numbered = self.client.get(reverse("library:book_list"), {"page": 1})
+        self.assertFalse(numbered.context["cursor_mode"])
+        self.assertEqual(numbered.context["total_count"], 5)
+
+
+class SectionCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+
+    def compute(self):
+        self.calls += 1
+        return self.calls
+
+    def test_cached_until_invalidated_on_commit(self):
+        self.assertEqual(section_cache.get_section("test", self.compute), 1)
+        self.assertEqual(section_cache.get_section("test", self.compute), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            section_cache.invalidate("test")
+        self.assertEqual(section_cache.get_section("test", self.compute), 2)
+
+    def test_rolled_back_invalidation_keeps_the_section(self):
+        section_cache.get_section("test", self.compute)
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    section_cache.invalidate("test")
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        self.assertEqual(section_cache.get_section("test", self.compute), 1)
+
+    @override_settings(HOME_CACHE_TIMEOUT=0)
+    def test_stale_copy_is_served_while_another_worker_refreshes(self):
+        section_cache.get_section("test", self.compute)
+        key = section_cache._current_key("test")
+        cache.add(key + section_cache.LOCK_SUFFIX, 1)
+        self.assertEqual(section_cache.get_section("test", self.compute), 1)
+        cache.delete(key + section_cache.LOCK_SUFFIX)
+        self.assertEqual(section_cache.get_section("test", self.compute), 2)
+
+    def test_home_sections_follow_catalog_writes(self):
+        self.client.get(reverse("library:home"))
+        with self.captureOnCommitCallbacks(execute=True):
+            create_book("Fresh Arrival")
+        response = self.client.get(reverse("library:home"))
+        self.assertEqual([book.title for book in response.context["latest_books"]], ["Fresh Arrival"])
+        self.assertEqual(response.context["stats"]["books"], 1)
+
+
+class BookCountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.book = create_book("Fables", author="Ann Teller", category="Tales")
+        create_book("Myths", author=cls.book.author, category=cls.book.category)
+        cls.other_author = Author.objects.create(full_name="Ben Teller")
+        cls.other_category = Category.objects.create(name="Legends")
+
+    def counts(self, *objects):
+        return [type(obj).objects.get(pk=obj.pk).book_count for obj in objects]
+
+    def test_create_move_and_delete(self):
+        author, category = self.book.author, self.book.category
+        self.assertEqual(self.counts(author, category), [2, 2])
+
+        book = Book.objects.get(pk=self.book.pk)
+        book.author, book.category = self.other_author, self.other_category
+        book.save()
+        self.assertEqual(self.counts(author, category, self.other_author, self.other_category), [1, 1, 1, 1])
+
+        book.title = "Retold Fables"
+        book.save(update_fields=["title"])
+        book.delete()
+        self.assertEqual(self.counts(author, category, self.other_author, self.other_category), [1, 1, 0, 0])
+
+    def test_save_without_loaded_original_recounts(self):
+        stored = Book.objects.get(pk=self.book.pk)
+        moved = Book(**{field.attname: getattr(stored, field.attname) for field in Book._meta.concrete_fields})
+        moved._state.adding = False
+        moved.author = self.other_author
+        moved.save()
+        self.assertEqual(self.counts(self.other_author), [1])
+
+    def test_reconcile_book_counts_repairs_drift(self):
+        Author.objects.filter(pk=self.book.author_id).update(book_count=7)
+        out = StringIO()
+        call_command("reconcile_book_counts", "--dry-run", stdout=out)
+        self.assertIn("Authors: 1 with drift.", out.getvalue())
+        self.assertIn("Categories: no drift.", out.getvalue())
+
+        call_command("reconcile_book_counts", stdout=out)
+        self.assertIn("Authors: repaired 1.", out.getvalue())
+        self.assertEqual(self.counts(self.book.author), [2])
+
+
+class PrecompressedStaticTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.static_root = Path(cls.enterClassContext(tempfile.TemporaryDirectory()))
+        cls.enterClassContext(override_settings(STATIC_ROOT=cls.static_root, SERVE_STATIC=True))
+        call_command("collectstatic", interactive=False, verbosity=0)
+        cls.hashed_css = staticfiles_storage.hashed_files["css/app.css"]
+
+    def setUp(self):
+        self.middleware = PrecompressedStaticFilesMiddleware(lambda request: HttpResponse("app"))
+
+    def get(self, name, **headers):
+        return self.middleware(RequestFactory().get(f"/static/{name}", headers=headers))
+
+    def test_collectstatic_writes_compressed_siblings_of_hashed_names(self):
+        self.assertRegex(self.hashed_css, r"^css/app\.[0-9a-f]{12}\.css$")
+        original = (self.static_root / self.hashed_css).read_bytes()
+        self.assertEqual(gzip.decompress((self.static_root / f"{self.hashed_css}.gz").read_bytes()), original)
+        for suffix in ENCODINGS:
+            self.assertTrue((self.static_root / f"{self.hashed_css}{suffix}").is_file())
+
+    def test_hashed_name_is_served_compressed_and_immutable(self):
+        response = self.get(self.hashed_css, accept_encoding="gzip, deflate, br")
+        encoding, _compress = next(iter(ENCODINGS.values()))
+        self.assertEqual(response["Content-Encoding"], encoding)
+        self.assertIn("immutable", response["Cache-Control"])
+        self.assertIn("Accept-Encoding", response["Vary"])
+        self.assertEqual(response["Content-Type"], "text/css")
+
+        plain = self.get(self.hashed_css, accept_encoding="gzip;q=0")
+        self.assertNotIn("Content-Encoding", plain)
+        self.assertEqual(b"".join(plain.streaming_content), (self.static_root / self.hashed_css).read_bytes())
+
+    def test_security_headers_are_added_to_static_responses(self):
+        response = self.client.get(f"/static/{self.hashed_css}")
+        self.assertEqual(response["X-Content-Type-Options"], "nosniff")
+        self.assertIn("immutable", response["Cache-Control"])
+
+    def test_unhashed_name_gets_a_short_max_age_and_revalidates(self):
+        response = self.get("css/app.css")
+        self.assertEqual(response["Cache-Control"], "public, max-age=60")
+        self.assertEqual(self.get("css/app.css", if_modified_since=response["Last-Modified"]).status_code, 304)
+
+    def test_missing_files_and_traversal_fall_through(self):
+        self.assertEqual(self.get("css/missing.css").content, b"app")
+        self.assertEqual(self.get("../manage.py").content, b"app")
+
+    def test_parse_accept_encoding(self):
+        self.assertEqual(parse_accept_encoding("GZip;q=0.5, br;q=0, deflate;q=x, *"), {"gzip", "*"})
+
+
+class BookSaveValidationTests(TestCase):
+    """Book saves skip the validation queries the database already covers."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.book = create_book("Motion", copies=2)
+
+    def test_counter_update_validates_only_the_changed_field(self):
+        book = Book.objects.get(pk=self.book.pk)
+        book.available_copies = 1
+        # savepoint, update, release: no author or category lookups
+        with self.assertNumQueries(3):
+            book.save(update_fields=["available_copies"])
+        book.available_copies = 3
+        with self.assertRaises(ValidationError), self.assertNumQueries(0):
+            book.save(update_fields=["available_copies"])
+
+    def test_unloaded_foreign_keys_are_still_checked(self):
+        book = Book.objects.get(pk=self.book.pk)
+        book.author_id = 0
+        with self.assertRaisesMessage(ValidationError, "author"):
+            book.save()
+
+
+class BookAdminTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = create_user("curator", is_staff=True, is_superuser=True)
+        cls.dune = create_book("Dune", author="Frank Herbert", language="English", publication_year=1965)
+        cls.emma = create_book("Emma", author="Jane Austen", language="English", publication_year=1815)
+        cls.maigret = create_book("Maigret", author="Georges Simenon", language="French", publication_year=1931)
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def changelist(self, **params):
+        response = self.client.get(reverse("admin:library_book_changelist"), params)
+        self.assertEqual(response.status_code, 200)
+        return sorted(book.title for book in response.context["cl"].result_list)
+
+    def test_input_filters(self):
+        self.assertEqual(self.changelist(author="Jane Austen"), ["Emma"])
+        self.assertEqual(self.changelist(language="English", year="1965"), ["Dune"])
+        self.assertEqual(self.changelist(author="Jane"), [])
+
+    def test_invalid_year_falls_back_to_the_unfiltered_list(self):
+        response = self.client.get(reverse("admin:library_book_changelist"), {"year": "soon"})
+        self.assertRedirects(response, reverse("admin:library_book_changelist") + "?e=1")
+
+    def test_search_goes_through_the_catalog(self):
+        self.assertEqual(self.changelist(q="simenon"), ["Maigret"])
+        self.assertEqual(self.changelist(q="dune", language="French"), [])
+        self.assertIsNone(self.client.get(reverse("admin:library_book_changelist")).context["cl"].full_result_count)
+
+
+class InventoryAdjustmentTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = create_user("stock", email="stock@example.com", is_staff=True, is_superuser=True)
+        cls.loaned = create_book("Scales", copies=2, author="Ola Tune", category="Music")
+        cls.shelved = create_book("Chords", copies=3, author=cls.loaned.author, category=cls.loaned.category)
+        BorrowRecord.objects.create(user=cls.admin, book=cls.loaned)
+
+    def copies(self, book):
+        book.refresh_from_db()
+        return book.total_copies, book.available_copies
+
+    def test_one_update_keeps_loans_accounted_for(self):
+        with self.assertNumQueries(5):  # savepoint, locked read, update, waiting holds, release
+            adjusted, rejected = adjust_copies(Book.objects.all(), 2)
+        self.assertEqual((len(adjusted), rejected), (2, []))
+        self.assertEqual(self.copies(self.loaned), (4, 3))
+
+        adjusted, rejected = adjust_copies(Book.objects.all(), -4)
+        self.assertEqual([book.pk for book in adjusted], [self.shelved.pk])
+        self.assertEqual([book.pk for book in rejected], [self.loaned.pk])
+        self.assertEqual(self.copies(self.loaned), (4, 3))
+        self.assertEqual(self.copies(self.shelved), (1, 1))
+
+    def test_added_copies_go_to_waiting_holds_first(self):
+        first, second = create_user("q1"), create_user("q2")
+        Book.objects.filter(pk=self.loaned.pk).update(available_copies=0, total_copies=1)
+        holds = [Hold.objects.create(user=user, book=self.loaned) for user in (first, second, self.admin)]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            adjusted, _rejected = adjust_copies(Book.objects.filter(pk=self.loaned.pk), 2)
+        self.assertEqual((adjusted[0].total_copies, adjusted[0].available_copies), (3, 0))
+        self.assertEqual(self.copies(self.loaned), (3, 0))
+        statuses = [Hold.objects.get(pk=hold.pk).status for hold in holds]
+        self.assertEqual(statuses, [Hold.READY, Hold.READY, Hold.WAITING])
+
+    def test_selection_may_filter_on_the_copy_counts(self):
+        adjusted, rejected = adjust_copies(Book.objects.filter(available_copies=3), 1)
+        self.assertEqual([(book.pk, book.available_copies) for book in adjusted], [(self.shelved.pk, 4)])
+        self.assertEqual(rejected, [])
+
+    def test_admin_action(self):
+        self.client.force_login(self.admin)
+        response = self.client.post(
+            reverse("admin:library_book_changelist"),
+            {"action": "remove_copies", "copies": "2", "_selected_action": [self.loaned.pk, self.shelved.pk]},
+            follow=True,
+        )
+        shown = [str(message) for message in response.context["messages"]]
+        self.assertEqual(len(shown), 2)
+        self.assertIn("Chords (now 1/1)", shown[0])
+        self.assertIn("Scales (1 available)", shown[1])
+        self.assertEqual(self.copies(self.loaned), (2, 1))
+
+    def test_command(self):
+        out = StringIO()
+        call_command("adjust_copies", "-1", "--book", str(self.loaned.pk), "--dry-run", stdout=out)
+        self.assertIn("would adjust 1", out.getvalue())
+        self.assertEqual(self.copies(self.loaned), (2, 1))
+        call_command("adjust_copies", "1", "--language", "English", stdout=StringIO())
+        self.assertEqual(self.copies(self.shelved), (4, 4))
+
+
+class ImportCatalogTests(TestCase):
+    ROWS = [
+        ("Dune", "Frank Herbert", "Sci-Fi", "Sand.", "3"),
+        ("Emma", "Jane Austen", "Novels", "Match.", "2"),
+        ("Nameless", "", "Novels", "No author.", "1"),
+        ("Persuasion", "Jane Austen", "Sci Fi", "Navy.", "1"),
+        ("Hyperion", "Dan Simmons", "Sci-Fi", "", "1"),
+    ]
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, "books.csv")
+        with open(self.path, "w", encoding="utf-8") as source:
+            source.write("title,author,category,description,language,total_copies\n")
+            for title, author, category, description, copies in self.ROWS:
+                source.write(f"{title},{author},{category},{description},English,{copies}\n")
+        Author.objects.create(full_name="Jane Austen")
+
+    def run_import(self, *args):
+        call_command("import_catalog", self.path, "--batch-size", "2", *args, stdout=StringIO())
+
+    def test_import_with_reports_and_counters(self):
+        self.run_import()
+        self.assertEqual(
+            sorted(Book.objects.values_list("title", "total_copies", "available_copies")),
+            [("Dune", 3, 3), ("Emma", 2, 2), ("Persuasion", 1, 1)],
+        )
+        self.assertEqual(Author.objects.get(full_name="Jane Austen").book_count, 2)
+        self.assertEqual(
+            sorted(Category.objects.values_list("name", "slug", "book_count")),
+            [("Novels", "novels", 1), ("Sci Fi", "sci-fi-1", 1), ("Sci-Fi", "sci-fi", 1)],
+        )
+        with open(f"{self.path}.rejects.jsonl", encoding="utf-8") as report:
+            rejects = [json.loads(line) for line in report]
+        self.assertEqual([(r["record"], list(r["errors"])) for r in rejects], [(3, ["author"]), (5, ["description"])])
+        self.assertFalse(ImportCheckpoint.objects.exists())
+
+    def test_resume_from_checkpoint(self):
+        ImportCheckpoint.objects.create(source=os.path.abspath(self.path), records=2, imported=2)
+        with self.assertRaises(CommandError):
+            self.run_import()
+        self.run_import("--resume")
+        self.assertEqual(list(Book.objects.values_list("title", flat=True)), ["Persuasion"])
+        self.assertFalse(ImportCheckpoint.objects.exists())
+
+    def test_checkpoint_commits_with_its_batch(self):
+        real_index_books = search.index_books
+
+        def fail_second_batch(book_ids):
+            if Book.objects.filter(title="Persuasion").exists():
+                raise RuntimeError("crashed")
+            real_index_books(book_ids)
+
+        with mock.patch("library.search.index_books", side_effect=fail_second_batch), self.assertRaises(RuntimeError):
+            self.run_import()
+        checkpoint = ImportCheckpoint.objects.get()
+        self.assertEqual((checkpoint.records, checkpoint.imported), (2, 2))
+
+        self.run_import("--resume")
+        self.assertEqual(sorted(Book.objects.values_list("title", flat=True)), ["Dune", "Emma", "Persuasion"])
+
+    def test_restart_discards_the_checkpoint(self):
+        ImportCheckpoint.objects.create(source=os.path.abspath(self.path), records=4, imported=3)
+        self.run_import("--restart")
+        self.assertEqual(Book.objects.count(), 3)
+
+
+class SlugAllocationTests(TestCase):
+    def test_one_query_for_a_batch_of_colliding_names(self):
+        Category.objects.create(name="Travel")
+        categories = [Category(name=name) for name in ("Travel!", "travel", "Travel?", "Maps")]
+        with self.assertNumQueries(1):
+            slugs.allocate_slugs(categories, "name")
+        self.assertEqual([c.slug for c in categories], ["travel-1", "travel-2", "travel-3", "maps"])
+        Category.objects.bulk_create(categories)
+
+    def test_save_retries_after_losing_the_slug_race(self):
+        real_taken_slugs = slugs._taken_slugs
+        calls = []
+
+        def stale_then_real(*args, **kwargs):
+            # The first allocation misses a category committed concurrently.
+            calls.append(args)
+            return set() if len(calls) == 1 else real_taken_slugs(*args, **kwargs)
+
+        Category.objects.bulk_create([Category(name="Old Maps", slug="atlas")])
+        with mock.patch("library.slugs._taken_slugs", side_effect=stale_then_real):
+            category = Category.objects.create(name="Atlas")
+        self.assertEqual((category.slug, len(calls)), ("atlas-1", 2))
+
+    def test_other_integrity_errors_are_not_retried(self):
+        Category.objects.create(name="Oceans")
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Category.objects.create(name="Oceans")
@@ -9,9 +9,12 @@ urlpatterns = [
     path("books/", views.book_list, name="book_list"),
     path("books/<int:pk>/", views.book_detail, name="book_detail_alias"),
     path("book/<int:pk>/", views.book_detail, name="book_detail"),
+    path("book/<int:pk>/reviews/", views.book_reviews_fragment, name="book_reviews_fragment"),
     path("categories/", views.category_list, name="category_list"),
     path("categories/<slug:slug>/", views.category_detail, name="category_detail"),
+    path("categories/<slug:slug>/books/", views.category_books_fragment, name="category_books_fragment"),
     path("authors/", views.author_list, name="author_list"),
     path("authors/<int:pk>/", views.author_detail, name="author_detail"),
+    path("authors/<int:pk>/books/", views.author_books_fragment, name="author_books_fragment"),
     path("contact/", views.contact, name="contact"),
 ]
@@ -1,84 +1,77 @@
 from django.contrib.auth import get_user_model
 from django.core.paginator import Paginator
-from django.db.models import Avg, Count, Q, Value, DecimalField
-from django.db.models.functions import Coalesce
 from django.shortcuts import get_object_or_404, render, redirect
+from django.urls import reverse
 from django.utils.http import urlencode
+from django.views.decorators.http import condition
+from django.views.decorators.vary import vary_on_cookie
 from django import forms
 
+from . import cache as section_cache
+from . import search
+from .conditional import catalog_etag
 from .models import Author, Book, Category
-from borrowing.models import BorrowRecord
-from reviews.models import Review
+from .pagination import CursorPaginator, estimate_count
+from borrowing.patron import patron_state
+from reviews.models import RatingBucket
 from .models import ContactMessage
 
 
+# Sorts that support cursor pagination; CursorPaginator appends the pk tiebreak.
+BOOK_LIST_KEYSET_ORDERINGS = {
+    "newest": ["-created_at"],
+    "oldest": ["created_at"],
+    "rating": ["-avg_rating", "-review_count", "-created_at"],
+}
+
+
 def home(request):
     """
     Public landing page showing hero, latest books, top rated picks, and site stats.
-    Queries are kept narrow with select_related/annotations to avoid N+1s.
+    Each section is cached and invalidated by library.signals when its data changes.
     """
-    latest_books = (
-        Book.objects.select_related("author", "category")
-        .annotate(
-            avg_rating=Coalesce(
-                Avg("reviews__stars", output_field=DecimalField(max_digits=3, decimal_places=1)),
-                Value(0, output_field=DecimalField(max_digits=3, decimal_places=1)),
-            ),
-            review_count=Count("reviews"),
-        )
-        .order_by("-created_at")[:6]
-    )
+    context = {
+        "latest_books": section_cache.get_section(section_cache.HOME_LATEST_BOOKS, _home_latest_books),
+        "top_rated_books": section_cache.get_section(section_cache.HOME_TOP_RATED_BOOKS, _home_top_rated_books),
+        "stats": section_cache.get_section(section_cache.HOME_STATS, _home_stats),
+    }
+    return render(request, "library/home.html", context)
 
-    top_rated_books = (
+
+def _home_latest_books():
+    return list(Book.objects.select_related("author", "category").order_by("-created_at")[:6])
+
+
+def _home_top_rated_books():
+    return list(
         Book.objects.select_related("author", "category")
-        .annotate(
-            avg_rating=Coalesce(
-                Avg("reviews__stars", output_field=DecimalField(max_digits=3, decimal_places=1)),
-                Value(0, output_field=DecimalField(max_digits=3, decimal_places=1)),
-            ),
-            review_count=Count("reviews"),
-        )
         .filter(review_count__gt=0)
         .order_by("-avg_rating", "-review_count", "-created_at")[:3]
     )
 
+
+def _home_stats():
     User = get_user_model()
-    stats = {
+    return {
         "books": Book.objects.count(),
         "authors": Author.objects.count(),
         "categories": Category.objects.count(),
         "users": User.objects.count(),
     }
 
-    context = {
-        "latest_books": latest_books,
-        "top_rated_books": top_rated_books,
-        "stats": stats,
-    }
-    return render(request, "library/home.html", context)
-
 
+@vary_on_cookie
+@condition(etag_func=catalog_etag)
 def book_list(request):
     """
-    Public list of books with search, category filter, sort, and pagination.
-    Uses annotations for ratings to keep sorting and display efficient.
+    Public list of books with full-text search, category filter, sort, and pagination.
+    Ratings come from the stored aggregates on Book, so the rating sort is index-backed.
     """
-    books_qs = (
-        Book.objects.select_related("author", "category")
-        .annotate(
-            avg_rating=Coalesce(
-                Avg("reviews__stars", output_field=DecimalField(max_digits=3, decimal_places=1)),
-                Value(0, output_field=DecimalField(max_digits=3, decimal_places=1)),
-            ),
-            review_count=Count("reviews"),
-        )
-    )
+    books_qs = Book.objects.select_related("author", "category")
 
     query = request.GET.get("q", "").strip()
     if query:
-        books_qs = books_qs.filter(
-            Q(title__icontains=query) | Q(author__full_name__icontains=query)
-        )
+        books_qs = search.search_books(books_qs, query)
 
     category_param = request.GET.get("category")
     category_obj = None
@@ -89,27 +82,43 @@ def book_list(request):
         if category_obj:
             books_qs = books_qs.filter(category=category_obj)
 
-    sort_param = request.GET.get("sort", "newest")
-    if sort_param == "oldest":
-        books_qs = books_qs.order_by("created_at")
-    elif sort_param == "rating":
-        books_qs = books_qs.order_by("-avg_rating", "-review_count", "-created_at")
+    sort_param = request.GET.get("sort") or ("relevance" if query else "newest")
+    if sort_param == "relevance" and query and search.is_available():
+        ordering = ["search_rank", "-created_at"]
+    elif sort_param in BOOK_LIST_KEYSET_ORDERINGS:
+        ordering = BOOK_LIST_KEYSET_ORDERINGS[sort_param]
     else:
         sort_param = "newest"
-        books_qs = books_qs.order_by("-created_at")
-
-    paginator = Paginator(books_qs, 9)
-    page_number = request.GET.get("page")
-    page_obj = paginator.get_page(page_number)
+        ordering = BOOK_LIST_KEYSET_ORDERINGS["newest"]
+
+    # Keyset sorts page by cursor; ?page=N keeps the numbered pager for old links.
+    cursor_mode = sort_param in BOOK_LIST_KEYSET_ORDERINGS and "page" not in request.GET
+    total_count = None
+    estimated_count = None
+    if cursor_mode:
+        paginator = CursorPaginator(books_qs, ordering, 9, key=f"book_list:{sort_param}")
+        page_obj = paginator.get_page(request.GET.get("cursor"))
+        if request.GET.get("count"):
+            total_count = books_qs.count()
+        elif not query and category_obj is None:
+            estimated_count = estimate_count(Book)
+    else:
+        paginator = Paginator(books_qs.order_by(*ordering), 9)
+        page_obj = paginator.get_page(request.GET.get("page"))
+        total_count = paginator.count
 
     categories = Category.objects.order_by("name")
 
     base_querydict = request.GET.copy()
     base_querydict.pop("page", None)
+    base_querydict.pop("cursor", None)
     preserved_query = urlencode([(k, v) for k, v in base_querydict.items() if v])
 
     context = {
         "page_obj": page_obj,
+        "cursor_mode": cursor_mode,
+        "total_count": total_count,
+        "estimated_count": estimated_count,
         "categories": categories,
         "selected_category": category_obj,
         "query": query,
@@ -119,106 +128,130 @@ def book_list(request):
     return render(request, "library/book_list.html", context)
 
 
+@vary_on_cookie
+@condition(etag_func=catalog_etag)
 def book_detail(request, pk):
     """
-    Public book detail page with metadata, availability, rating, and recent reviews.
+    Public book detail page with metadata, availability, rating histogram, and a
+    first page of reviews (more are loaded through book_reviews_fragment).
     """
-    book = get_object_or_404(
-        Book.objects.select_related("author", "category").annotate(
-            avg_rating=Coalesce(
-                Avg("reviews__stars", output_field=DecimalField(max_digits=3, decimal_places=1)),
-                Value(0, output_field=DecimalField(max_digits=3, decimal_places=1)),
-            ),
-            review_count=Count("reviews"),
-        ),
-        pk=pk,
-    )
+    book = get_object_or_404(Book.objects.select_related("author", "category"), pk=pk)
 
-    reviews = (
-        book.reviews.select_related("user")
-        .order_by("-created_at")
-    )
+    reviews_page = _book_reviews_page(request, book)
 
     already_borrowed = False
     can_borrow = False
     user_review = None
     can_review = False
     has_returned = False
+    hold = None
+    can_place_hold = False
     if request.user.is_authenticated:
-        already_borrowed = BorrowRecord.objects.filter(
-            user=request.user, book=book, returned_at__isnull=True
-        ).exists()
-        active_count = BorrowRecord.objects.filter(
-            user=request.user, returned_at__isnull=True
-        ).count()
-        can_borrow = book.available_copies > 0 and not already_borrowed and active_count < 5
-
-        user_review = Review.objects.filter(user=request.user, book=book).first()
-        has_returned = BorrowRecord.objects.filter(
-            user=request.user, book=book, returned_at__isnull=False
-        ).exists()
-        can_review = has_returned and user_review is None
+        state = patron_state(request, book)
+        already_borrowed = state.already_borrowed
+        can_borrow = state.can_borrow(book)
+        user_review = state.review
+        has_returned = state.has_returned
+        can_review = state.can_review
+        can_place_hold = state.can_place_hold(book)
+        hold = state.hold
 
     context = {
         "book": book,
-        "reviews": reviews,
+        "reviews_page": reviews_page,
+        "reviews_fragment_url": reverse("library:book_reviews_fragment", args=[book.pk]),
+        "histogram": RatingBucket.histogram(book) if book.review_count else [],
         "already_borrowed": already_borrowed,
         "can_borrow": can_borrow,
         "user_review": user_review,
         "can_review": can_review,
         "has_returned": has_returned,
+        "hold": hold,
+        "can_place_hold": can_place_hold,
     }
     return render(request, "library/book_detail.html", context)
 
 
+def book_reviews_fragment(request, pk):
+    """Next batch of reviews for the book page's "load more" button (HTML fragment only)."""
+    book = get_object_or_404(Book.objects.only("id"), pk=pk)
+    context = {
+        "page_obj": _book_reviews_page(request, book),
+        "fragment_url": reverse("library:book_reviews_fragment", args=[book.pk]),
+    }
+    return render(request, "partials/review_items.html", context)
+
+
+def _book_reviews_page(request, book):
+    reviews = book.reviews.select_related("user")
+    paginator = CursorPaginator(reviews, ["-created_at"], 10, key=f"reviews:{book.pk}")
+    return paginator.get_page(request.GET.get("cursor"))
+
+
 # Categories
 def category_list(request):
-    categories = Category.objects.annotate(
-        book_count=Count("books")
-    ).order_by("name")
+    categories = Category.objects.order_by("name")
     return render(request, "library/category_list.html", {"categories": categories})
 
 
+@vary_on_cookie
+@condition(etag_func=catalog_etag)
 def category_detail(request, slug):
     category = get_object_or_404(Category, slug=slug)
-    books = (
-        category.books.select_related("author", "category")
-        .annotate(
-            avg_rating=Coalesce(
-                Avg("reviews__stars", output_field=DecimalField(max_digits=3, decimal_places=1)),
-                Value(0, output_field=DecimalField(max_digits=3, decimal_places=1)),
-            ),
-            review_count=Count("reviews"),
-        )
-        .order_by("-created_at")
-    )
-    return render(
-        request,
-        "library/category_detail.html",
-        {"category": category, "books": books},
-    )
+    page_obj = _detail_books_page(request, category.books.all(), f"category:{category.pk}")
+    context = {
+        "category": category,
+        "page_obj": page_obj,
+        "fragment_url": reverse("library:category_books_fragment", args=[category.slug]),
+    }
+    return render(request, "library/category_detail.html", context)
+
+
+def category_books_fragment(request, slug):
+    """Next batch of category book cards for infinite scroll (HTML fragment only)."""
+    category = get_object_or_404(Category.objects.only("id", "slug"), slug=slug)
+    page_obj = _detail_books_page(request, category.books.all(), f"category:{category.pk}")
+    context = {
+        "page_obj": page_obj,
+        "fragment_url": reverse("library:category_books_fragment", args=[category.slug]),
+    }
+    return render(request, "partials/category_books.html", context)
 
 
 # Authors
 def author_list(request):
-    authors = Author.objects.annotate(book_count=Count("books")).order_by("full_name")
+    authors = Author.objects.order_by("full_name")
     return render(request, "library/author_list.html", {"authors": authors})
 
 
+@vary_on_cookie
+@condition(etag_func=catalog_etag)
 def author_detail(request, pk):
     author = get_object_or_404(Author, pk=pk)
-    books = (
-        author.books.select_related("author", "category")
-        .annotate(
-            avg_rating=Coalesce(
-                Avg("reviews__stars", output_field=DecimalField(max_digits=3, decimal_places=1)),
-                Value(0, output_field=DecimalField(max_digits=3, decimal_places=1)),
-            ),
-            review_count=Count("reviews"),
-        )
-        .order_by("-created_at")
-    )
-    return render(request, "library/author_detail.html", {"author": author, "books": books})
+    page_obj = _detail_books_page(request, author.books.all(), f"author:{author.pk}")
+    context = {
+        "author": author,
+        "page_obj": page_obj,
+        "fragment_url": reverse("library:author_books_fragment", args=[author.pk]),
+    }
+    return render(request, "library/author_detail.html", context)
+
+
+def author_books_fragment(request, pk):
+    """Next batch of author book cards for infinite scroll (HTML fragment only)."""
+    author = get_object_or_404(Author.objects.only("id"), pk=pk)
+    page_obj = _detail_books_page(request, author.books.all(), f"author:{author.pk}")
+    context = {
+        "page_obj": page_obj,
+        "fragment_url": reverse("library:author_books_fragment", args=[author.pk]),
+    }
+    return render(request, "partials/author_books.html", context)
+
+
+def _detail_books_page(request, books_qs, key):
+    """Newest-first cursor page of books, bounded regardless of catalog size."""
+    paginator = CursorPaginator(books_qs.select_related("author", "category"), ["-created_at"], 12, key=key)
+    return paginator.get_page(request.GET.get("cursor"))
 
 
 # Contact
@@ -0,0 +1,55 @@
+# Generated by Django 6.0.1 on 2026-10-18 10:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_rating_buckets(apps, schema_editor):
+    Review = apps.get_model("reviews", "Review")
+    RatingBucket = apps.get_model("reviews", "RatingBucket")
+    RatingBucket.objects.bulk_create(
+        (
+            RatingBucket(book_id=row["book_id"], stars=row["stars"], count=row["count"])
+            for row in Review.objects.order_by().values("book_id", "stars").annotate(count=Count("id"))
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0007_author_category_book_count'),
+        ('reviews', '0002_alter_review_stars'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RatingBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stars', models.DecimalField(decimal_places=1, max_digits=3)),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['-stars'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['book', '-created_at', '-id'], name='reviews_rev_book_id_66e14b_idx'),
+        ),
+        migrations.AddField(
+            model_name='ratingbucket',
+            name='book',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rating_buckets', to='library.book'),
+        ),
+        migrations.AddConstraint(
+            model_name='ratingbucket',
+            constraint=models.UniqueConstraint(fields=('book', 'stars'), name='unique_rating_bucket_per_book'),
+        ),
+        migrations.RunPython(backfill_rating_buckets, migrations.RunPython.noop),
+    ]
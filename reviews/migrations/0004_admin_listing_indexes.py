@@ -0,0 +1,20 @@
+# Generated by Django 6.0.1 on 2026-10-18 13:20
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0010_admin_listing_indexes'),
+        ('reviews', '0003_ratingbucket'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['-created_at', '-id'], name='reviews_rev_created_8f4198_idx'),
+        ),
+    ]
@@ -3,9 +3,10 @@ from decimal import Decimal
 from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
 
-from borrowing.models import BorrowRecord
+from borrowing.history import has_returned
 
 
 class Review(models.Model):
@@ -32,19 +33,30 @@ class Review(models.Model):
         constraints = [
             models.UniqueConstraint(fields=["user", "book"], name="unique_review_per_user_book")
         ]
+        indexes = [
+            models.Index(fields=["book", "-created_at", "-id"]),
+            models.Index(fields=["-created_at", "-id"]),
+        ]
 
     def __str__(self) -> str:  # pragma: no cover - trivial
         return f"{self.user} -> {self.book} ({self.stars} stars)"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what the book aggregates currently include for this review.
+        instance._stored_rating = (instance.__dict__.get("book_id"), instance.__dict__.get("stars"))
+        return instance
+
+    def save(self, *args, **kwargs):
+        # Keep the review row and the book's rating aggregates in one transaction.
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
     def clean(self):
         super().clean()
         if self.user_id and self.book_id:
-            has_borrowed_and_returned = BorrowRecord.objects.filter(
-                user_id=self.user_id,
-                book_id=self.book_id,
-                returned_at__isnull=False,
-            ).exists()
-            if not has_borrowed_and_returned:
+            if not has_returned(self.user_id, self.book_id):
                 raise ValidationError(
                     "User must have borrowed and returned this book before submitting a review."
                 )
@@ -52,3 +64,66 @@ class Review(models.Model):
         if self.stars is not None:
             if (Decimal(str(self.stars)) * 2) % 1 != 0:
                 raise ValidationError({"stars": "Rating must be in 0.5 increments."})
+
+
+class RatingBucket(models.Model):
+    """
+    Number of reviews of a book at one half-star rating. Maintained by
+    reviews.signals on every review write so the star histogram on the book
+    page is read from at most nine rows instead of scanning reviews.
+    """
+
+    book = models.ForeignKey(
+        "library.Book",
+        on_delete=models.CASCADE,
+        related_name="rating_buckets",
+    )
+    stars = models.DecimalField(max_digits=3, decimal_places=1)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ["-stars"]
+        constraints = [
+            models.UniqueConstraint(fields=["book", "stars"], name="unique_rating_bucket_per_book")
+        ]
+
+    def __str__(self) -> str:  # pragma: no cover - trivial
+        return f"{self.book_id} @ {self.stars}: {self.count}"
+
+    @classmethod
+    def shift(cls, book_id, stars, delta):
+        with transaction.atomic():
+            updated = cls.objects.filter(book_id=book_id, stars=stars).update(count=F("count") + delta)
+            if updated or delta <= 0:
+                return
+            try:
+                with transaction.atomic():
+                    cls.objects.create(book_id=book_id, stars=stars, count=delta)
+            except IntegrityError:
+                # A concurrent review created the bucket first.
+                cls.objects.filter(book_id=book_id, stars=stars).update(count=F("count") + delta)
+
+    @classmethod
+    def rebuild_for(cls, book_id):
+        """Recount the buckets of one book from its reviews."""
+        with transaction.atomic():
+            cls.objects.filter(book_id=book_id).delete()
+            cls.objects.bulk_create(
+                cls(book_id=book_id, stars=row["stars"], count=row["count"])
+                for row in Review.objects.filter(book_id=book_id)
+                .order_by()
+                .values("stars")
+                .annotate(count=models.Count("id"))
+            )
+
+    @classmethod
+    def histogram(cls, book):
+        """Rows of (stars, count, percent) for every half-star step, 5.0 down to 1.0."""
+        counts = dict(cls.objects.filter(book=book).values_list("stars", "count"))
+        total = sum(counts.values())
+        rows = []
+        for step in range(10, 1, -1):
+            stars = Decimal(step) / 2
+            count = counts.get(stars, 0)
+            rows.append((stars, count, round(count * 100 / total) if total else 0))
+        return rows
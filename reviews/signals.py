@@ -0,0 +1,41 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from library.models import Book
+
+from .models import RatingBucket, Review
+
+
+@receiver(post_save, sender=Review)
+def add_review_to_book_rating(sender, instance, created, **kwargs):
+    previous_book_id, previous_stars = getattr(instance, "_stored_rating", (None, None))
+
+    if created:
+        Book.apply_review_delta(instance.book_id, instance.stars, 1)
+        RatingBucket.shift(instance.book_id, instance.stars, 1)
+    elif previous_book_id is None or previous_stars is None:
+        # Saved without a loaded original; fall back to recounting the book.
+        Book.refresh_rating(instance.book_id)
+        RatingBucket.rebuild_for(instance.book_id)
+    elif previous_book_id != instance.book_id:
+        Book.apply_review_delta(previous_book_id, -previous_stars, -1)
+        Book.apply_review_delta(instance.book_id, instance.stars, 1)
+        RatingBucket.shift(previous_book_id, previous_stars, -1)
+        RatingBucket.shift(instance.book_id, instance.stars, 1)
+    elif previous_stars != instance.stars:
+        Book.apply_review_delta(instance.book_id, instance.stars - previous_stars, 0)
+        RatingBucket.shift(instance.book_id, previous_stars, -1)
+        RatingBucket.shift(instance.book_id, instance.stars, 1)
+
+    instance._stored_rating = (instance.book_id, instance.stars)
+
+
+@receiver(post_delete, sender=Review)
+def remove_review_from_book_rating(sender, instance, **kwargs):
+    book_id, stars = getattr(instance, "_stored_rating", (None, None))
+    if book_id is None or stars is None:
+        Book.refresh_rating(instance.book_id)
+        RatingBucket.rebuild_for(instance.book_id)
+        return
+    Book.apply_review_delta(book_id, -stars, -1)
+    RatingBucket.shift(book_id, stars, -1)
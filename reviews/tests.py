@@ -1,3 +1,155 @@
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
 from django.test import TestCase
+from django.urls import reverse
+
+from library.models import Book
+from library.testing import create_book, create_user
+
+from .models import RatingBucket, Review
+
+
+class RatingAggregateTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.book = create_book("Orbits")
+        cls.other = create_book("Moons")
+        cls.ana, cls.ben = create_user("ana"), create_user("ben")
+
+    def aggregates(self, book):
+        book.refresh_from_db()
+        return book.rating_total, book.review_count, book.avg_rating
+
+    def test_create_update_move_and_delete(self):
+        first = Review.objects.create(user=self.ana, book=self.book, stars=Decimal("4.5"))
+        Review.objects.create(user=self.ben, book=self.book, stars=3)
+        self.assertEqual(self.aggregates(self.book), (Decimal("7.5"), 2, Decimal("3.75")))
+
+        first.stars = Decimal("2.0")
+        first.save()
+        self.assertEqual(self.aggregates(self.book), (Decimal("5.0"), 2, Decimal("2.50")))
+
+        first.book = self.other
+        first.save()
+        self.assertEqual(self.aggregates(self.book), (Decimal("3.0"), 1, Decimal("3.00")))
+        self.assertEqual(self.aggregates(self.other), (Decimal("2.0"), 1, Decimal("2.00")))
+
+        first.delete()
+        self.assertEqual(self.aggregates(self.other), (Decimal("0.0"), 0, Decimal("0.00")))
+
+    def test_save_without_loaded_original_recounts(self):
+        review = Review.objects.create(user=self.ana, book=self.book, stars=4)
+        Review(pk=review.pk, user=self.ana, book=self.book, stars=Decimal("1.5"), created_at=review.created_at).save()
+        self.assertEqual(self.aggregates(self.book), (Decimal("1.5"), 1, Decimal("1.50")))
+
+    def test_apply_review_delta_is_relative(self):
+        Book.apply_review_delta(self.book.pk, Decimal("5"), 1)
+        Book.apply_review_delta(self.book.pk, Decimal("4"), 1)
+        Book.apply_review_delta(self.book.pk, Decimal("-5"), -1)
+        self.assertEqual(self.aggregates(self.book), (Decimal("4.0"), 1, Decimal("4.00")))
+
+    def test_rebuild_ratings_repairs_drift(self):
+        Review.objects.create(user=self.ana, book=self.book, stars=5)
+        Book.objects.filter(pk=self.book.pk).update(rating_total=0, review_count=9, avg_rating=0)
+
+        out = StringIO()
+        call_command("rebuild_ratings", "--dry-run", stdout=out)
+        self.assertIn("1 book rating aggregate(s) would be repaired", out.getvalue())
+        self.assertEqual(self.aggregates(self.book)[1], 9)
+
+        call_command("rebuild_ratings", stdout=StringIO())
+        self.assertEqual(self.aggregates(self.book), (Decimal("5.0"), 1, Decimal("5.00")))
+
+
+class RatingHistogramTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.book = create_book("Comets")
+        cls.users = [create_user(f"reader{n}") for n in range(12)]
+
+    def buckets(self):
+        return dict(RatingBucket.objects.filter(book=self.book).values_list("stars", "count"))
+
+    def test_buckets_follow_review_writes(self):
+        review = Review.objects.create(user=self.users[0], book=self.book, stars=Decimal("4.5"))
+        Review.objects.create(user=self.users[1], book=self.book, stars=Decimal("4.5"))
+        self.assertEqual(self.buckets(), {Decimal("4.5"): 2})
+
+        review.stars = 2
+        review.save()
+        self.assertEqual(self.buckets(), {Decimal("4.5"): 1, Decimal("2.0"): 1})
+
+        review.delete()
+        self.assertEqual(self.buckets(), {Decimal("4.5"): 1, Decimal("2.0"): 0})
+
+    def test_rebuild_for_recounts_from_reviews(self):
+        Review.objects.create(user=self.users[0], book=self.book, stars=3)
+        RatingBucket.objects.filter(book=self.book).update(count=5)
+        RatingBucket.shift(self.book.pk, Decimal("1.0"), 2)
+        RatingBucket.rebuild_for(self.book.pk)
+        self.assertEqual(self.buckets(), {Decimal("3.0"): 1})
+
+    def test_histogram_covers_every_half_star(self):
+        for user, stars in zip(self.users, ("5", "5", "5", "1.5")):
+            Review.objects.create(user=user, book=self.book, stars=Decimal(stars))
+        rows = RatingBucket.histogram(self.book)
+        self.assertEqual([stars for stars, _count, _percent in rows], [Decimal(n) / 2 for n in range(10, 1, -1)])
+        self.assertEqual(rows[0], (Decimal("5.0"), 3, 75))
+        self.assertEqual(rows[7], (Decimal("1.5"), 1, 25))
+        self.assertEqual(sum(count for _stars, count, _percent in rows), 4)
+
+    def test_book_page_shows_first_reviews_and_loads_the_rest(self):
+        for user in self.users:
+            Review.objects.create(user=user, book=self.book, stars=4, comment=f"By {user.username}")
+        response = self.client.get(reverse("library:book_detail", args=[self.book.pk]))
+        first = response.context["reviews_page"]
+        self.assertEqual(len(first.object_list), 10)
+        self.assertEqual(response.context["histogram"][2][1], 12)
+
+        rest = self.client.get(
+            reverse("library:book_reviews_fragment", args=[self.book.pk]), {"cursor": first.next_cursor}
+        )
+        self.assertTemplateUsed(rest, "partials/review_items.html")
+        self.assertEqual(len(rest.context["page_obj"].object_list), 2)
+        seen = {review.pk for review in first.object_list} | {review.pk for review in rest.context["page_obj"]}
+        self.assertEqual(len(seen), 12)
+
+
+class ReviewAdminTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = create_user("moderator", is_staff=True, is_superuser=True)
+        cls.ana = create_user("ana", email="ana@example.com")
+        cls.ben = create_user("ben")
+        cls.comets = create_book("Comets", author="Vera Sky")
+        cls.tides = create_book("Tides", author="Ola Sea")
+        cls.praise = Review.objects.create(user=cls.ana, book=cls.comets, stars=Decimal("4.5"))
+        cls.doubt = Review.objects.create(user=cls.ben, book=cls.tides, stars=2)
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def changelist(self, **params):
+        response = self.client.get(reverse("admin:reviews_review_changelist"), params)
+        self.assertEqual(response.status_code, 200)
+        return list(response.context["cl"].result_list)
+
+    def test_stars_filter_offers_fixed_half_stars(self):
+        response = self.client.get(reverse("admin:reviews_review_changelist"))
+        stars = next(spec for spec in response.context["cl"].filter_specs if spec.parameter_name == "stars")
+        self.assertEqual([value for value, _label in stars.lookup_choices][:2], ["5.0", "4.5"])
+        self.assertEqual(self.changelist(stars="4.5"), [self.praise])
+        self.assertEqual(self.changelist(stars="3.0"), [])
+
+    def test_patron_and_book_filters(self):
+        self.assertEqual(self.changelist(user="ben"), [self.doubt])
+        self.assertEqual(self.changelist(book=str(self.comets.pk)), [self.praise])
+        self.assertEqual(self.changelist(book="Tides"), [self.doubt])
+
+    def test_search_matches_the_catalog_and_exact_patron(self):
+        self.assertEqual(self.changelist(q="sky"), [self.praise])
+        self.assertEqual(self.changelist(q="ana@example.com"), [self.praise])
+        self.assertEqual(self.changelist(q="an"), [])
 
-# Create your tests here.
@@ -3,7 +3,7 @@ from django.contrib.auth.decorators import login_required
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
 
-from borrowing.models import BorrowRecord
+from borrowing.patron import forget_patron_state, patron_state
 from library.models import Book
 
 from .forms import ReviewForm
@@ -12,27 +12,26 @@ from .models import Review
 
 @login_required
 def add_review(request, book_id):
-    book = get_object_or_404(Book, pk=book_id)
+    book = get_object_or_404(Book.objects.select_related("author"), pk=book_id)
 
-    existing = Review.objects.filter(user=request.user, book=book).first()
+    state = patron_state(request, book)
 
-    has_returned = BorrowRecord.objects.filter(
-        user=request.user,
-        book=book,
-        returned_at__isnull=False,
-    ).exists()
-
-    if not has_returned:
+    if not state.has_returned:
         messages.error(request, "Return this book before leaving a review.")
         return redirect("library:book_detail", pk=book_id)
 
+    existing = state.review
     if request.method == "POST":
+        if existing is not None:
+            # Load the stored row so the rating aggregates see the old stars.
+            existing = Review.objects.get(pk=existing.pk)
         form = ReviewForm(request.POST, instance=existing)
         if form.is_valid():
             review = form.save(commit=False)
             review.user = request.user
             review.book = book
             review.save()
+            forget_patron_state(request)
             messages.success(request, "Thanks for your review!" if existing is None else "Review updated.")
             return redirect("library:book_detail", pk=book_id)
         messages.error(request, "Please fix the errors below.")
@@ -41,6 +41,59 @@ document.addEventListener('DOMContentLoaded', () => {
     });
   }
 
+  // Infinite scroll for paginated lists (category/author books, book reviews).
+  // data-infinite-scroll="click" only loads when the "Load more" link is used.
+  document.querySelectorAll('[data-infinite-scroll]').forEach((grid) => {
+    let loading = false;
+    const autoLoad = grid.dataset.infiniteScroll !== 'click';
+
+    const loadMore = async (sentinel) => {
+      const link = sentinel.querySelector('[data-fragment-url]');
+      if (!link || loading) return;
+      loading = true;
+      link.classList.add('disabled');
+      try {
+        const response = await fetch(link.dataset.fragmentUrl, {
+          headers: { 'X-Requested-With': 'XMLHttpRequest' },
+        });
+        if (!response.ok) throw new Error(`HTTP ${response.status}`);
+        const html = await response.text();
+        sentinel.remove();
+        grid.insertAdjacentHTML('beforeend', html);
+        watch();
+      } catch (err) {
+        // Leave the plain "Load more" link working as a fallback.
+        link.classList.remove('disabled');
+      } finally {
+        loading = false;
+      }
+    };
+
+    const observer = autoLoad && 'IntersectionObserver' in window
+      ? new IntersectionObserver((entries) => {
+          entries.forEach((entry) => {
+            if (entry.isIntersecting) {
+              observer.unobserve(entry.target);
+              loadMore(entry.target);
+            }
+          });
+        }, { rootMargin: '400px 0px' })
+      : null;
+
+    const watch = () => {
+      const sentinel = grid.querySelector('[data-load-more]');
+      if (!sentinel) return;
+      const link = sentinel.querySelector('[data-fragment-url]');
+      link?.addEventListener('click', (e) => {
+        e.preventDefault();
+        loadMore(sentinel);
+      });
+      observer?.observe(sentinel);
+    };
+
+    watch();
+  });
+
   // Rating star coloring with half increments
   document.querySelectorAll('[data-rating-group]').forEach((group) => {
     const starsInput = group.closest('form')?.querySelector('input[name="stars"]') || group.querySelector('input[name="stars"]');